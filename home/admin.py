@@ -5,9 +5,16 @@ from .models import Problem
 @admin.register(Problem)
 class ProblemAdmin(admin.ModelAdmin):
     list_display = ['id', 'text_short', 'answer']
+    list_filter = ['ege_number']
     search_fields = ['text']
 
     def text_short(self, obj):
         return obj.text[:50] + "..." if len(obj.text) > 50 else obj.text
 
-    text_short.short_description = 'Текст задачи'
\ No newline at end of file
+    text_short.short_description = 'Текст задачи'
+
+    def get_search_results(self, request, queryset, search_term):
+        # Полнотекстовый поиск по индексу вместо icontains по каждому слову
+        if not search_term:
+            return queryset, False
+        return queryset.search(search_term), False
@@ -0,0 +1,479 @@
+import functools
+import inspect
+import io
+import threading
+import multiprocessing
+from concurrent.futures import (
+    CancelledError, ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+)
+from concurrent.futures.process import BrokenProcessPool
+
+import matplotlib
+
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+from .instrumentation import timed
+
+PROBLEM_NUMBERS = list(range(1, 13))
+# Не больше стольких точек на графике прогресса, сколько бы ни было попыток
+PROGRESS_CHART_POINTS = 500
+PROGRESS_MARKERS_LIMIT = 100
+
+_executor = None
+_executor_lock = threading.Lock()
+# Отрисовки в пуле по ключу кэша: одинаковые запросы ждут один future
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def init_render_worker():
+    """Подготовить процесс пула: импорт matplotlib и прогрев кэша шрифтов"""
+    import matplotlib
+
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    plt.figure()
+    plt.text(0.5, 0.5, 'Задача')
+    figure_to_png()
+
+
+def get_render_executor():
+    global _executor
+
+    workers = getattr(settings, 'CHART_RENDER_WORKERS', 0)
+    if not workers:
+        return None
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=workers,
+                # spawn: воркеры не наследуют соединения с БД и потоки веб-сервера
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_render_worker
+            )
+        return _executor
+
+
+def reset_render_executor():
+    global _executor
+
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def store_chart(key, image_png):
+    if image_png is not None:
+        caches['charts'].set(key, image_png)
+
+
+def finish_chart(key, future):
+    """Положить результат отрисовки из пула в кэш и снять её с учета"""
+    if not future.cancelled() and future.exception() is None:
+        store_chart(key, future.result())
+    with _in_flight_lock:
+        if _in_flight.get(key) is future:
+            del _in_flight[key]
+
+
+def render_chart(key, render, *args):
+    """Отрисовать график в пуле процессов или, если пул выключен, в текущем процессе.
+
+    Готовый PNG попадает в кэш, даже если запрос не дождался отрисовки:
+    тогда возвращается None, а следующий запрос получит картинку из кэша.
+    Пока график с этим ключом рисуется, повторные запросы ждут ту же отрисовку.
+    """
+    executor = get_render_executor()
+    if executor is None:
+        image_png = render(*args)
+        store_chart(key, image_png)
+        return image_png
+
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        submitted = future is None
+        if submitted:
+            try:
+                future = executor.submit(render, *args)
+            except BrokenProcessPool:
+                future = None
+            else:
+                _in_flight[key] = future
+
+    if future is None:
+        reset_render_executor()
+        image_png = render(*args)
+        store_chart(key, image_png)
+        return image_png
+
+    if submitted:
+        # Вне блокировки: для уже завершенного future колбэк вызывается сразу
+        future.add_done_callback(lambda done: finish_chart(key, done))
+    try:
+        return future.result(timeout=getattr(settings, 'CHART_RENDER_TIMEOUT', 3))
+    except (FuturesTimeoutError, CancelledError):
+        # CancelledError: пул пересоздали после сбоя, пока запрос ждал
+        return None
+    except BrokenProcessPool:
+        reset_render_executor()
+        image_png = render(*args)
+        store_chart(key, image_png)
+        return image_png
+
+
+@functools.lru_cache(maxsize=None)
+def pending_chart_png():
+    """Заглушка, пока график рисуется в пуле; рисуется один раз на процесс.
+
+    Без pyplot: его общее состояние нельзя трогать из потоков веб-сервера.
+    """
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(14, 7))
+    figure.text(
+        0.5, 0.5, 'График готовится — обновите страницу через несколько секунд',
+        ha='center', va='center', fontsize=18, color='gray'
+    )
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png', dpi=100)
+    return buffer.getvalue()
+
+
+def get_chart_png(kind, version, prepare):
+    """PNG графика из кэша; перерисовывается только при смене версии данных.
+
+    prepare() вызывается только при промахе и возвращает функцию отрисовки
+    вместе с её аргументами — простыми списками чисел, которые можно
+    передать в процесс пула.
+    """
+    key = f'chart:{kind}:{version}'
+
+    image_png = caches['charts'].get(key)
+    if image_png is None:
+        with timed('chart'):
+            render, args = prepare()
+            image_png = render_chart(key, render, *args)
+    return image_png
+
+
+def chart_series(kind, render, args):
+    """Данные графика для отрисовки в браузере: аргументы функции отрисовки по именам"""
+    names = inspect.signature(render).parameters
+    series = {}
+    for name, value in zip(names, args):
+        if isinstance(value, (list, tuple)):
+            series[name] = [round(item, 1) for item in value]
+        else:
+            series[name] = round(value, 1)
+
+    return {
+        'kind': kind,
+        'labels': PROBLEM_NUMBERS,
+        'series': series,
+    }
+
+
+def figure_to_png():
+    buffer = io.BytesIO()
+    plt.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
+    buffer.seek(0)
+    image_png = buffer.getvalue()
+    buffer.close()
+    plt.close()
+    return image_png
+
+
+def accuracy_colors(accuracies):
+    colors = []
+    for acc in accuracies:
+        if acc >= 70:
+            colors.append('#4CAF50')
+        elif acc >= 40:
+            colors.append('#FF9800')
+        else:
+            colors.append('#F44336')
+    return colors
+
+
+def cumulative_accuracy_series(outcomes, compacted=(0, 0)):
+    """Номера попыток и накопленная точность (%) по последовательности исходов.
+
+    compacted — (всего, правильных) свернутых попыток, сделанных до outcomes:
+    их порядок не сохранился, поэтому ряд начинается с одной точки после них.
+    """
+    compacted_total, compacted_correct = compacted
+    outcomes = np.fromiter(outcomes, dtype=bool)
+    attempt_numbers = np.arange(compacted_total + 1, compacted_total + len(outcomes) + 1)
+    cumulative_accuracy = (np.cumsum(outcomes) + compacted_correct) * 100.0 / attempt_numbers
+    if compacted_total:
+        attempt_numbers = np.insert(attempt_numbers, 0, compacted_total)
+        cumulative_accuracy = np.insert(
+            cumulative_accuracy, 0, compacted_correct * 100.0 / compacted_total
+        )
+    return attempt_numbers, cumulative_accuracy
+
+
+def downsample_lttb(x, y, threshold):
+    """Прореживание ряда алгоритмом Largest-Triangle-Three-Buckets.
+
+    Оставляет threshold точек, сохраняя визуальную форму кривой: из каждой
+    корзины берется точка, образующая наибольший треугольник с уже
+    выбранной точкой и средним следующей корзины.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+
+    bucket_size = (n - 2) / (threshold - 2)
+    sampled = np.empty(threshold, dtype=np.int64)
+    sampled[0] = 0
+    sampled[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(area.argmax())
+        sampled[i + 1] = a
+
+    return x[sampled], y[sampled]
+
+
+def render_progress_chart(attempt_numbers, cumulative_accuracy, average_accuracy):
+    plt.figure(figsize=(12, 6))
+
+    # Маркеры только для коротких рядов, иначе они сливаются в полосу
+    marker = 'o' if len(attempt_numbers) <= PROGRESS_MARKERS_LIMIT else None
+    plt.plot(attempt_numbers, cumulative_accuracy,
+             color='#4CAF50', linewidth=3, marker=marker, markersize=5,
+             label='Точность (%)')
+
+    plt.fill_between(attempt_numbers, cumulative_accuracy, alpha=0.2, color='#4CAF50')
+
+    plt.axhline(y=average_accuracy, color='#FF5722', linestyle='--',
+                linewidth=2, alpha=0.7, label=f'Средняя: {average_accuracy:.1f}%')
+
+    plt.xlabel('Номер попытки', fontsize=12, fontweight='bold')
+    plt.ylabel('Точность (%)', fontsize=12, fontweight='bold')
+    plt.title('Динамика точности решений', fontsize=16, fontweight='bold', pad=20)
+    plt.grid(True, alpha=0.3, linestyle='--')
+    plt.legend(loc='best')
+    plt.ylim(0, 100)
+
+    if len(cumulative_accuracy) > 0:
+        last_acc = cumulative_accuracy[-1]
+        plt.annotate(f'{last_acc:.1f}%',
+                     xy=(attempt_numbers[-1], last_acc),
+                     xytext=(10, 10), textcoords='offset points',
+                     bbox=dict(boxstyle='round,pad=0.3', facecolor='yellow', alpha=0.7),
+                     arrowprops=dict(arrowstyle='->', connectionstyle='arc3,rad=0'))
+
+    plt.tight_layout()
+    return figure_to_png()
+
+
+def render_global_accuracy_chart(accuracies, overall_accuracy):
+    plt.figure(figsize=(14, 7))
+
+    bars = plt.bar(PROBLEM_NUMBERS, accuracies, color=accuracy_colors(accuracies),
+                   edgecolor='black', linewidth=1.5)
+
+    plt.xlabel('Номер задачи', fontsize=13, fontweight='bold')
+    plt.ylabel('Точность (%)', fontsize=13, fontweight='bold')
+    plt.title('Общая точность по типам задач', fontsize=16, fontweight='bold', pad=20)
+    plt.xticks(PROBLEM_NUMBERS)
+    plt.ylim(0, 100)
+    plt.grid(axis='y', alpha=0.3, linestyle='--')
+
+    for bar, acc in zip(bars, accuracies):
+        height = bar.get_height()
+        plt.text(bar.get_x() + bar.get_width() / 2., height + 1,
+                 f'{acc:.1f}%', ha='center', va='bottom', fontsize=10, fontweight='bold')
+
+    plt.axhline(y=overall_accuracy, color='#2196F3', linestyle='--',
+                linewidth=2, alpha=0.7, label=f'Средняя: {overall_accuracy:.1f}%')
+
+    plt.legend(loc='upper right')
+
+    ax = plt.gca()
+    ax.set_facecolor('#f8f9fa')
+
+    plt.tight_layout()
+    return figure_to_png()
+
+
+def render_global_comparison_chart(total_attempts, correct_attempts):
+    fig, ax1 = plt.subplots(figsize=(14, 7))
+
+    bars = ax1.bar(PROBLEM_NUMBERS, total_attempts, color='#2196F3', alpha=0.7, label='Всего попыток')
+
+    ax2 = ax1.twinx()
+    ax2.plot(PROBLEM_NUMBERS, correct_attempts, color='#4CAF50',
+             marker='s', linewidth=3, markersize=8, label='Правильные решения')
+
+    ax1.set_xlabel('Номер задачи', fontsize=13, fontweight='bold')
+    ax1.set_ylabel('Количество попыток', fontsize=13, fontweight='bold', color='#2196F3')
+    ax2.set_ylabel('Правильные решения', fontsize=13, fontweight='bold', color='#4CAF50')
+
+    ax1.tick_params(axis='y', labelcolor='#2196F3')
+    ax2.tick_params(axis='y', labelcolor='#4CAF50')
+
+    plt.title('Сравнение: попытки vs правильные решения', fontsize=16, fontweight='bold', pad=20)
+    plt.xticks(PROBLEM_NUMBERS)
+
+    for bar, total in zip(bars, total_attempts):
+        height = bar.get_height()
+        ax1.text(bar.get_x() + bar.get_width() / 2., height + max(total_attempts) * 0.01,
+                 f'{total}', ha='center', va='bottom', fontsize=9)
+
+    for i, correct in enumerate(correct_attempts):
+        ax2.text(PROBLEM_NUMBERS[i], correct + max(correct_attempts) * 0.02,
+                 f'{correct}', ha='center', va='bottom', fontsize=9, fontweight='bold', color='#2E7D32')
+
+    lines_1, labels_1 = ax1.get_legend_handles_labels()
+    lines_2, labels_2 = ax2.get_legend_handles_labels()
+    ax1.legend(lines_1 + lines_2, labels_1 + labels_2, loc='upper left')
+
+    plt.grid(axis='x', alpha=0.3)
+    plt.tight_layout()
+    return figure_to_png()
+
+
+def render_user_vs_global_chart(user_accuracies, global_accuracies):
+    fig, ax = plt.subplots(figsize=(14, 7))
+
+    x = np.arange(len(PROBLEM_NUMBERS))
+    width = 0.35
+
+    bars1 = ax.bar(x - width / 2, user_accuracies, width,
+                   label='Ваша точность', color='#4CAF50', edgecolor='black')
+    bars2 = ax.bar(x + width / 2, global_accuracies, width,
+                   label='Общая точность', color='#2196F3', edgecolor='black', alpha=0.7)
+
+    ax.set_xlabel('Номер задачи', fontsize=13, fontweight='bold')
+    ax.set_ylabel('Точность (%)', fontsize=13, fontweight='bold')
+    ax.set_title('Сравнение вашей точности с общей точностью', fontsize=16, fontweight='bold', pad=20)
+    ax.set_xticks(x)
+    ax.set_xticklabels(PROBLEM_NUMBERS)
+    ax.set_ylim(0, 100)
+    ax.grid(axis='y', alpha=0.3, linestyle='--')
+
+    ax.legend(loc='upper right')
+
+    def autolabel(bars):
+        for bar in bars:
+            height = bar.get_height()
+            if height > 0:
+                ax.annotate(f'{height:.1f}%',
+                            xy=(bar.get_x() + bar.get_width() / 2, height),
+                            xytext=(0, 3),
+                            textcoords="offset points",
+                            ha='center', va='bottom', fontsize=9,
+                            fontweight='bold' if height >= 50 else 'normal')
+
+    autolabel(bars1)
+    autolabel(bars2)
+
+    for i in range(len(PROBLEM_NUMBERS)):
+        user_acc = user_accuracies[i]
+        global_acc = global_accuracies[i]
+        diff = user_acc - global_acc
+
+        if abs(diff) > 5:
+            diff_color = '#2E7D32' if diff > 0 else '#C62828'
+            diff_text = f"+{diff:.1f}%" if diff > 0 else f"{diff:.1f}%"
+
+            y_pos = max(user_acc, global_acc) + 5
+            ax.annotate(diff_text,
+                        xy=(i, y_pos),
+                        xytext=(0, 0),
+                        textcoords="offset points",
+                        ha='center', va='bottom',
+                        fontsize=10, fontweight='bold',
+                        color=diff_color)
+
+    plt.tight_layout()
+    return figure_to_png()
+
+
+def render_user_accuracy_chart(accuracies, average_accuracy):
+    plt.figure(figsize=(14, 7))
+
+    bars = plt.bar(PROBLEM_NUMBERS, accuracies, color=accuracy_colors(accuracies),
+                   edgecolor='black', linewidth=1.5)
+
+    plt.xlabel('Номер задачи', fontsize=13, fontweight='bold')
+    plt.ylabel('Точность (%)', fontsize=13, fontweight='bold')
+    plt.title('Моя точность по типам задач', fontsize=16, fontweight='bold', pad=20)
+    plt.xticks(PROBLEM_NUMBERS)
+    plt.ylim(0, 100)
+    plt.grid(axis='y', alpha=0.3, linestyle='--')
+
+    for bar, acc in zip(bars, accuracies):
+        height = bar.get_height()
+        plt.text(bar.get_x() + bar.get_width() / 2., height + 1,
+                 f'{acc:.1f}%', ha='center', va='bottom', fontsize=10, fontweight='bold')
+
+    plt.axhline(y=average_accuracy, color='#2196F3', linestyle='--',
+                linewidth=2, alpha=0.7, label=f'Средняя: {average_accuracy:.1f}%')
+
+    plt.legend(loc='upper right')
+
+    ax = plt.gca()
+    ax.set_facecolor('#f8f9fa')
+
+    plt.tight_layout()
+    return figure_to_png()
+
+
+def render_user_comparison_chart(user_accuracies, global_accuracies):
+    x = np.arange(len(PROBLEM_NUMBERS))
+    width = 0.35
+
+    fig, ax = plt.subplots(figsize=(14, 7))
+
+    bars1 = ax.bar(x - width / 2, user_accuracies, width,
+                   label='Моя точность', color='#4CAF50', edgecolor='black')
+    bars2 = ax.bar(x + width / 2, global_accuracies, width,
+                   label='Общая точность', color='#2196F3', edgecolor='black', alpha=0.7)
+
+    ax.set_xlabel('Номер задачи', fontsize=13, fontweight='bold')
+    ax.set_ylabel('Точность (%)', fontsize=13, fontweight='bold')
+    ax.set_title('Сравнение: моя точность vs общая точность', fontsize=16, fontweight='bold', pad=20)
+    ax.set_xticks(x)
+    ax.set_xticklabels(PROBLEM_NUMBERS)
+    ax.set_ylim(0, 100)
+    ax.grid(axis='y', alpha=0.3, linestyle='--')
+
+    ax.legend()
+
+    def autolabel(bars):
+        for bar in bars:
+            height = bar.get_height()
+            ax.annotate(f'{height:.1f}%',
+                        xy=(bar.get_x() + bar.get_width() / 2, height),
+                        xytext=(0, 3),
+                        textcoords="offset points",
+                        ha='center', va='bottom', fontsize=9)
+
+    autolabel(bars1)
+    autolabel(bars2)
+
+    plt.tight_layout()
+    return figure_to_png()
@@ -0,0 +1,109 @@
+"""Потоковая выгрузка журнала попыток для аналитики"""
+import csv
+from datetime import timedelta
+
+from .models import UserProblemAttempt
+from .statistics import start_of_day
+
+# Колонки выгрузки: поле в запросе -> заголовок
+EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('created_at', 'created_at'),
+    ('session_key', 'session_key'),
+    ('problem_id', 'problem_id'),
+    ('ege_number', 'ege_number'),
+    ('problem__answer', 'correct_answer'),
+    ('user_answer', 'user_answer'),
+    ('is_correct', 'is_correct'),
+    ('score', 'score'),
+]
+CHUNK_SIZE = 5000
+
+
+def export_rows(date_from=None, date_to=None, chunk_size=CHUNK_SIZE):
+    """Кортежи попыток в порядке времени; даты включительно.
+
+    iterator(chunk_size) на PostgreSQL читает через серверный курсор,
+    поэтому в памяти одновременно не больше chunk_size строк.
+    """
+    attempts = UserProblemAttempt.objects.all()
+    if date_from is not None:
+        attempts = attempts.filter(created_at__gte=start_of_day(date_from))
+    if date_to is not None:
+        attempts = attempts.filter(created_at__lt=start_of_day(date_to + timedelta(days=1)))
+
+    return attempts.order_by('created_at', 'id').values_list(
+        *[field for field, header in EXPORT_COLUMNS]
+    ).iterator(chunk_size=chunk_size)
+
+
+class Echo:
+    """Файлоподобный объект для csv.writer, который возвращает записанную строку"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    """Строки CSV с заголовком по одной, для StreamingHttpResponse или файла"""
+    writer = csv.writer(Echo())
+    yield writer.writerow([header for field, header in EXPORT_COLUMNS])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def write_csv(rows, path):
+    count = -1
+    with open(path, 'w', encoding='utf-8', newline='') as output:
+        for line in iter_csv(rows):
+            output.write(line)
+            count += 1
+    return count
+
+
+def parquet_available():
+    """Импортируется ли pyarrow; без него выгрузка в Parquet не предлагается"""
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def export_formats():
+    return ('csv', 'parquet') if parquet_available() else ('csv',)
+
+
+def write_parquet(rows, path, chunk_size=CHUNK_SIZE):
+    """Записать попытки в Parquet группами строк по chunk_size; нужен pyarrow"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError('Для выгрузки в Parquet установите pyarrow: pip install pyarrow')
+
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('created_at', pa.timestamp('us', tz='UTC')),
+        ('session_key', pa.string()),
+        ('problem_id', pa.int64()),
+        ('ege_number', pa.int8()),
+        ('correct_answer', pa.float64()),
+        ('user_answer', pa.float64()),
+        ('is_correct', pa.bool_()),
+        ('score', pa.int32()),
+    ])
+
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                writer.write_table(pa.Table.from_arrays(list(zip(*chunk)), schema=schema))
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            writer.write_table(pa.Table.from_arrays(list(zip(*chunk)), schema=schema))
+            count += len(chunk)
+    return count
@@ -108,6 +108,19 @@ class StatisticsFilterForm(forms.Form):
     )
 
 
+class AttemptExportForm(forms.Form):
+    date_from = forms.DateField(required=False)
+    date_to = forms.DateField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from = cleaned_data.get('date_from')
+        date_to = cleaned_data.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError('Начало периода позже его конца')
+        return cleaned_data
+
+
 class UserSettingsForm(forms.Form):
     show_hints = forms.BooleanField(
         label='Показывать подсказки',
@@ -0,0 +1,154 @@
+"""Потоковый импорт банка задач из CSV и JSONL"""
+import csv
+import json
+import math
+from itertools import islice
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from .models import Problem
+from .variants import invalidate_problem_id_index
+
+FORMATS = ('csv', 'jsonl')
+UPDATE_FIELDS = ['text', 'answer', 'ege_number']
+
+
+def detect_format(path):
+    for file_format in FORMATS:
+        if path.endswith(f'.{file_format}'):
+            return file_format
+    return None
+
+
+def read_rows(stream, file_format):
+    """Строки файла по одной: (номер строки, словарь полей)"""
+    if file_format == 'csv':
+        # Заголовок — первая строка, данные начинаются со второй
+        for line_number, row in enumerate(csv.DictReader(stream), start=2):
+            yield line_number, row
+    else:
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                yield line_number, error
+                continue
+            yield line_number, row
+
+
+def parse_problem(row):
+    """Задача из строки файла; ValueError с описанием, если строка некорректна"""
+    if isinstance(row, Exception):
+        raise ValueError(f'некорректный JSON: {row}')
+    if not isinstance(row, dict):
+        raise ValueError('ожидается объект с полями text, answer, ege_number')
+
+    text = str(row.get('text') or '').strip()
+    if not text:
+        raise ValueError('пустой text')
+
+    try:
+        ege_number = int(row.get('ege_number'))
+    except (TypeError, ValueError):
+        raise ValueError(f"ege_number не целое число: {row.get('ege_number')!r}")
+    if not 1 <= ege_number <= 12:
+        raise ValueError(f'ege_number вне диапазона 1–12: {ege_number}')
+
+    try:
+        answer = float(str(row.get('answer')).replace(',', '.'))
+    except (TypeError, ValueError):
+        raise ValueError(f"answer не число: {row.get('answer')!r}")
+    if not math.isfinite(answer):
+        raise ValueError(f'answer не конечное число: {answer}')
+
+    problem_id = row.get('id')
+    if problem_id in (None, ''):
+        problem_id = None
+    else:
+        try:
+            problem_id = int(problem_id)
+        except (TypeError, ValueError):
+            raise ValueError(f'id не целое число: {problem_id!r}')
+
+    return Problem(id=problem_id, text=text, answer=answer, ege_number=ege_number)
+
+
+def parse_rows(rows, errors):
+    """Корректные задачи из строк как (строка, задача); ошибки складываются в errors"""
+    for line_number, row in rows:
+        try:
+            yield line_number, parse_problem(row)
+        except ValueError as error:
+            errors.append((line_number, str(error)))
+
+
+def save_batch(rows, errors):
+    """Записать пачку (строка, задача) в одной транзакции: с id — upsert, без id — вставка.
+
+    Строки, меняющие номер задачи с попытками, пропускаются с ошибкой в errors
+    (см. Problem.check_ege_number_change).
+    """
+    with_id = {}
+    for line_number, problem in rows:
+        if problem.id is not None:
+            # Последняя строка с тем же id в пачке побеждает
+            with_id[problem.id] = (line_number, problem)
+    without_id = [problem for line_number, problem in rows if problem.id is None]
+
+    with transaction.atomic():
+        locked_numbers = dict(
+            Problem.objects.filter(id__in=with_id).with_attempt_history()
+            .values_list('id', 'ege_number')
+        )
+        for problem_id, ege_number in locked_numbers.items():
+            line_number, problem = with_id[problem_id]
+            if problem.ege_number != ege_number:
+                errors.append((
+                    line_number,
+                    f'по задаче {problem_id} есть попытки, ege_number {ege_number} '
+                    f'нельзя сменить на {problem.ege_number}'
+                ))
+                del with_id[problem_id]
+
+        upserted = [problem for line_number, problem in with_id.values()]
+        if upserted:
+            Problem.objects.bulk_create(
+                upserted,
+                update_conflicts=True,
+                unique_fields=['id'],
+                update_fields=UPDATE_FIELDS
+            )
+        if without_id:
+            Problem.objects.bulk_create(without_id)
+
+    return len(upserted), len(without_id)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def import_problems(stream, file_format, batch_size, errors):
+    """Импортировать задачи пачками по batch_size; возвращает генератор (с id, без id) по пачкам.
+
+    Память не зависит от размера файла: в ней одновременно только одна пачка.
+    """
+    saved_with_id = False
+    try:
+        for batch in batched(parse_rows(read_rows(stream, file_format), errors), batch_size):
+            upserted, inserted = save_batch(batch, errors)
+            saved_with_id = saved_with_id or upserted > 0
+            yield upserted, inserted
+    finally:
+        if saved_with_id:
+            # Явные id не двигают последовательность, следующие вставки с ней бы столкнулись
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(), [Problem]):
+                    cursor.execute(sql)
+        # bulk_create не отправляет post_save, сигналы не сбросят кэш сами
+        invalidate_problem_id_index()
@@ -0,0 +1,147 @@
+"""Замеры запроса: число SQL-запросов, время базы, шаблонов и графиков.
+
+Включается настройкой REQUEST_INSTRUMENTATION. Middleware отдает заголовок
+Server-Timing, пишет строку в лог home.instrumentation и сверяет число
+запросов с бюджетом QUERY_BUDGETS по имени маршрута.
+"""
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger('home.instrumentation')
+
+_request_timings = ContextVar('request_timings', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestTimings:
+    """Накопленные за запрос замеры"""
+
+    def __init__(self):
+        self.queries = Counter()
+        self.db_time = 0.0
+        self.durations = Counter()
+
+    @property
+    def query_count(self):
+        return sum(self.queries.values())
+
+    def duplicate_queries(self):
+        """Шаблоны SQL, выполненные больше одного раза (признак N+1)"""
+        return {sql: count for sql, count in self.queries.items() if count > 1}
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            # Параметры передаются отдельно, поэтому текст SQL и есть отпечаток запроса
+            self.queries[sql] += 1
+
+
+@contextmanager
+def timed(kind):
+    """Прибавить длительность блока к замеру kind текущего запроса, если он идет"""
+    timings = _request_timings.get()
+    if timings is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.durations[kind] += time.perf_counter() - started
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        with timed('template'):
+            return super().render(context, request)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Бэкенд шаблонов Django, учитывающий время отрисовки в замерах запроса"""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return InstrumentedTemplate(template.template, self)
+
+
+class RequestInstrumentationMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_INSTRUMENTATION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings.record_query))
+                response = self.get_response(request)
+        finally:
+            _request_timings.reset(token)
+        total_time = time.perf_counter() - started
+
+        url_name = request.resolver_match.url_name if request.resolver_match else None
+        response['Server-Timing'] = server_timing(timings, total_time)
+        self.log(request, response, url_name, timings, total_time)
+        self.check_budget(url_name, timings)
+        return response
+
+    def log(self, request, response, url_name, timings, total_time):
+        duplicates = timings.duplicate_queries()
+        logger.info(json.dumps({
+            'path': request.path,
+            'view': url_name,
+            'status': response.status_code,
+            'queries': timings.query_count,
+            'duplicate_queries': sum(duplicates.values()),
+            'db_ms': round(timings.db_time * 1000, 1),
+            'template_ms': round(timings.durations['template'] * 1000, 1),
+            'chart_ms': round(timings.durations['chart'] * 1000, 1),
+            'total_ms': round(total_time * 1000, 1),
+        }, ensure_ascii=False))
+        for sql, count in duplicates.items():
+            logger.debug('Повторяющийся запрос x%s в %s: %s', count, url_name, sql)
+
+    def check_budget(self, url_name, timings):
+        budget = getattr(settings, 'QUERY_BUDGETS', {}).get(url_name)
+        if budget is None or timings.query_count <= budget:
+            return
+
+        message = f'{url_name}: {timings.query_count} запросов при бюджете {budget}'
+        if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+def server_timing(timings, total_time):
+    """Значение заголовка Server-Timing в миллисекундах"""
+    metrics = [
+        f'db;dur={timings.db_time * 1000:.1f};desc="{timings.query_count} queries"',
+        f"tpl;dur={timings.durations['template'] * 1000:.1f}",
+    ]
+    if timings.durations['chart']:
+        metrics.append(f"chart;dur={timings.durations['chart'] * 1000:.1f}")
+    metrics.append(f'total;dur={total_time * 1000:.1f}')
+    return ', '.join(metrics)
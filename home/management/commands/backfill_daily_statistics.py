@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from home.statistics import rebuild_daily_statistics
+
+
+class Command(BaseCommand):
+    help = 'Заполнить дневную статистику задач и пользователей из журнала попыток'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help='Пересчитать только последние N дней (по умолчанию вся история)'
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['days'] is not None:
+            since = timezone.localdate() - timedelta(days=options['days'] - 1)
+
+        requested_since = since
+        problems_count, users_count, since = rebuild_daily_statistics(since)
+
+        period = f'с {since:%d.%m.%Y}' if since else 'за всю историю'
+        if since and since != requested_since:
+            period += ' (более ранние дни свернуты compact_attempts)'
+        self.stdout.write(self.style.SUCCESS(
+            f'Дневная статистика {period} пересчитана: '
+            f'строк по задачам {problems_count}, по пользователям {users_count}'
+        ))
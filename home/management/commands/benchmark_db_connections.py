@@ -0,0 +1,103 @@
+import io
+import time
+from wsgiref.util import setup_testing_defaults
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = (
+        'Замерить время ответа страниц с текущими настройками подключения к базе '
+        'и с новым соединением на каждый запрос (CONN_MAX_AGE=0)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', action='append', dest='urls',
+            help='Адрес страницы (можно несколько раз), по умолчанию /numbers/ и /global-statistics/'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Число запросов к каждой странице в каждом режиме'
+        )
+        parser.add_argument(
+            '--host', default='localhost',
+            help='Заголовок Host, входящий в ALLOWED_HOSTS'
+        )
+
+    def handle(self, *args, **options):
+        urls = options['urls'] or ['/numbers/', '/global-statistics/']
+        settings_dict = connection.settings_dict
+        pooled = bool(settings_dict.get('OPTIONS', {}).get('pool'))
+
+        modes = [(
+            'пул psycopg' if pooled else f"CONN_MAX_AGE={settings_dict['CONN_MAX_AGE']}",
+            settings_dict['CONN_MAX_AGE']
+        )]
+        if not pooled and settings_dict['CONN_MAX_AGE'] != 0:
+            modes.append(('CONN_MAX_AGE=0', 0))
+
+        # Настоящий WSGI-обработчик, а не тестовый Client: Client отключает
+        # close_old_connections, и соединение не закрывалось бы между запросами
+        handler = WSGIHandler()
+        original_max_age = settings_dict['CONN_MAX_AGE']
+        try:
+            for title, max_age in modes:
+                settings_dict['CONN_MAX_AGE'] = max_age
+                # Соединение, открытое с прежними настройками, не должно попасть в замер
+                connection.close()
+                self.stdout.write(self.style.MIGRATE_HEADING(title))
+                for url in urls:
+                    self.write_timings(
+                        url, self.measure(handler, url, options['host'], options['requests'])
+                    )
+        finally:
+            settings_dict['CONN_MAX_AGE'] = original_max_age
+
+    def measure(self, handler, url, host, count):
+        # Первый запрос прогревает кэши приложения и не учитывается
+        if request(handler, url, host) != '200':
+            raise CommandError(f'{url} отвечает не 200')
+
+        timings = []
+        for _ in range(count):
+            started = time.perf_counter()
+            request(handler, url, host)
+            timings.append((time.perf_counter() - started) * 1000)
+        return sorted(timings)
+
+    def write_timings(self, url, timings):
+        def percentile(value):
+            return timings[min(len(timings) - 1, int(len(timings) * value))]
+
+        self.stdout.write(
+            f'  {url:<24} p50 {percentile(0.5):7.1f} мс   '
+            f'p95 {percentile(0.95):7.1f} мс   max {timings[-1]:7.1f} мс'
+        )
+
+
+def request(handler, url, host):
+    """GET через WSGI, как его выполняет сервер; возвращает код ответа.
+
+    Закрытие ответа отправляет request_finished, и close_old_connections
+    закрывает соединение или возвращает его в пул по настройкам базы.
+    """
+    path, _, query = url.partition('?')
+    environ = {
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'HTTP_HOST': host,
+        'wsgi.input': io.BytesIO(),
+    }
+    setup_testing_defaults(environ)
+    status = []
+
+    response = handler(environ, lambda code, headers, exc_info=None: status.append(code))
+    try:
+        for chunk in response:
+            pass
+    finally:
+        response.close()
+    return status[0].split()[0]
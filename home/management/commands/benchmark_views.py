@@ -0,0 +1,171 @@
+import json
+import random
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from home.models import Problem, UserProblemAttempt
+from home.seeding import seed_problems, seed_sessions
+
+VIEWS = ['index', 'full_variant', 'check_variant', 'user_statistics', 'global_statistics']
+
+
+class Command(BaseCommand):
+    help = (
+        'Замерить время ответа и число запросов основных страниц на нескольких объемах '
+        'данных. Работает во временной тестовой базе, результаты — в JSON для сравнения '
+        'между коммитами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='100,1000,10000',
+            help='Число сессий для каждого замера через запятую, по возрастанию'
+        )
+        parser.add_argument(
+            '--problems', type=int, default=600,
+            help='Сколько задач в банке'
+        )
+        parser.add_argument(
+            '--attempts-per-session', type=int, default=24,
+            help='Среднее число попыток на сессию'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=30,
+            help='Сколько раз запросить каждую страницу'
+        )
+        parser.add_argument(
+            '--random-seed', type=int, default=42,
+            help='Зерно генератора данных'
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл для результатов в JSON (по умолчанию JSON печатается в конце)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted(int(size) for size in options['sizes'].split(','))
+        except ValueError:
+            raise CommandError('--sizes: ожидаются целые числа через запятую')
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results = self.run_benchmarks(sizes, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = json.dumps(results, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(report)
+            self.stdout.write(self.style.SUCCESS(f"Результаты записаны в {options['output']}"))
+        else:
+            self.stdout.write(report)
+
+    def run_benchmarks(self, sizes, options):
+        rng = random.Random(options['random_seed'])
+        seed_problems(options['problems'], rng)
+
+        results = {
+            'commit': current_commit(),
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'problems': options['problems'],
+            'requests': options['requests'],
+            'sizes': [],
+        }
+
+        seeded_sessions = 0
+        for sessions in sizes:
+            seed_sessions(
+                sessions - seeded_sessions, options['attempts_per_session'], 90, rng
+            )
+            seeded_sessions = sessions
+            caches['shared'].clear()
+            caches['charts'].clear()
+
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'Сессий: {sessions}, попыток: {UserProblemAttempt.objects.count()}'
+            ))
+            views = {}
+            client = Client(HTTP_HOST='localhost')
+            for name in VIEWS:
+                views[name] = summarize(self.measure(client, name, options['requests']))
+                self.write_summary(name, views[name])
+
+            results['sizes'].append({
+                'sessions': sessions,
+                'attempts': UserProblemAttempt.objects.count(),
+                'views': views,
+            })
+
+        return results
+
+    def measure(self, client, name, count):
+        """Время (мс) и число запросов для count обращений к странице после прогрева"""
+        samples = []
+        for _ in range(count + 1):
+            if name == 'check_variant':
+                client.get(reverse('full_variant'))
+                problem_ids = client.session['current_variant_ids']
+                answers = {
+                    f'answer_{problem_id}': answer
+                    for problem_id, answer in Problem.objects.filter(
+                        id__in=problem_ids
+                    ).values_list('id', 'answer')
+                }
+                request = lambda: client.post(reverse(name), answers)
+            else:
+                request = lambda: client.get(reverse(name))
+
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = request()
+                elapsed = (time.perf_counter() - started) * 1000
+            if response.status_code not in (200, 302):
+                raise CommandError(f'{name} ответила {response.status_code}')
+            samples.append((elapsed, len(queries)))
+
+        # Первое обращение прогревает кэши и не учитывается
+        return samples[1:]
+
+    def write_summary(self, name, summary):
+        self.stdout.write(
+            f"  {name:<20} p50 {summary['p50_ms']:7.1f} мс   p95 {summary['p95_ms']:7.1f} мс   "
+            f"p99 {summary['p99_ms']:7.1f} мс   запросов {summary['queries']}"
+        )
+
+
+def summarize(samples):
+    timings = sorted(elapsed for elapsed, queries in samples)
+
+    def percentile(value):
+        return round(timings[min(len(timings) - 1, int(len(timings) * value))], 2)
+
+    return {
+        'p50_ms': percentile(0.5),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'mean_ms': round(sum(timings) / len(timings), 2),
+        'queries': max(queries for elapsed, queries in samples),
+    }
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from home.partitions import expired_attempt_partitions, is_attempt_table_partitioned
+from home.statistics import (
+    WEEKLY_WINDOW_DAYS, compact_attempt_partition, compact_attempts_batch
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Свернуть попытки старше горизонта хранения в AttemptSummary и удалить '
+        'их из журнала. На PostgreSQL месяцы целиком старше горизонта удаляются '
+        'вместе с партицией, остаток — пачками. Безопасно запускать повторно.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.ATTEMPT_RETENTION_DAYS,
+            help='Горизонт хранения сырых попыток в днях'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help='Сколько попыток сворачивать в одной транзакции'
+        )
+
+    def handle(self, *args, **options):
+        # Недельная статистика читает только журнал попыток
+        if options['days'] < WEEKLY_WINDOW_DAYS:
+            raise CommandError(
+                f'Горизонт хранения должен быть не меньше {WEEKLY_WINDOW_DAYS} дней: '
+                'иначе свертка заденет сравнение этой и прошлой недели'
+            )
+
+        horizon = timezone.now() - timedelta(days=options['days'])
+        compacted = 0
+
+        if is_attempt_table_partitioned():
+            for name, month in expired_attempt_partitions(horizon):
+                count = compact_attempt_partition(name, options['batch_size'])
+                compacted += count
+                self.stdout.write(f'Партиция {name} свернута и удалена: {count} попыток')
+
+        while True:
+            count = compact_attempts_batch(horizon, options['batch_size'])
+            if not count:
+                break
+            compacted += count
+            self.stdout.write(f'Свернуто попыток: {compacted}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Попытки до {horizon:%d.%m.%Y %H:%M} свернуты: {compacted}'
+        ))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from home.partitions import (
+    add_months, month_start, create_attempt_partition, list_attempt_partitions,
+    is_attempt_table_partitioned
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Создать помесячные партиции журнала попыток заранее (PostgreSQL). '
+        'Запускайте по расписанию, например раз в неделю. Старые партиции '
+        'сворачивает и удаляет compact_attempts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months', type=int, default=3,
+            help='На сколько месяцев вперед создать партиции'
+        )
+
+    def handle(self, *args, **options):
+        if not is_attempt_table_partitioned():
+            raise CommandError(
+                'Журнал попыток не секционирован: нужна база PostgreSQL и миграция home 0014'
+            )
+
+        current_month = month_start(timezone.localdate())
+        for offset in range(options['months'] + 1):
+            month = add_months(current_month, offset)
+            if create_attempt_partition(month):
+                self.stdout.write(self.style.SUCCESS(f'Создана партиция за {month:%m.%Y}'))
+
+        for name, month in list_attempt_partitions():
+            self.stdout.write(f'  {name}: {month:%m.%Y}')
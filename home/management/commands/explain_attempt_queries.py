@@ -0,0 +1,126 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from home.models import UserProblemAttempt
+from home.seeding import seed_problems, seed_sessions
+
+# Индексы, добавленные под реальные запросы к журналу попыток
+ATTEMPT_INDEXES = [
+    'attempt_session_created_idx',
+    'attempt_session_solved_idx',
+    'attempt_recent_success_idx',
+    'attempt_type_outcome_idx',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Показать планы запросов к UserProblemAttempt с составными индексами и без них. '
+        'Работает во временной тестовой базе, которую сначала наполняет синтетическими '
+        'попытками: рабочие таблицы не блокируются и статистика не меняется.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=1000000,
+            help='Сколько синтетических попыток добавить перед замерами, примерно; '
+                 'меньшее число ускоряет прогон, но на малой таблице планы с индексами и без них сближаются'
+        )
+        parser.add_argument(
+            '--sessions', type=int, default=20000,
+            help='Число синтетических сессий'
+        )
+        parser.add_argument(
+            '--problems', type=int, default=600,
+            help='Сколько задач в банке'
+        )
+
+    def handle(self, *args, **options):
+        if min(options['seed'], options['sessions'], options['problems']) < 1:
+            raise CommandError('--seed, --sessions и --problems должны быть положительными')
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.seed_attempts(options['seed'], options['sessions'], options['problems'])
+            self.explain_queries()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def explain_queries(self):
+        sample = UserProblemAttempt.objects.order_by().values('session_key').first()
+        session_key = sample['session_key']
+
+        for title, queryset in self.query_shapes(session_key):
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            self.stdout.write('  С индексами:')
+            self.write_plan(queryset)
+
+            if connection.vendor == 'postgresql':
+                # DDL в PostgreSQL транзакционный: индексы удаляются только на время замера
+                with transaction.atomic():
+                    with connection.cursor() as cursor:
+                        for name in ATTEMPT_INDEXES:
+                            cursor.execute(f'DROP INDEX IF EXISTS {connection.ops.quote_name(name)}')
+                    self.stdout.write('  Без составных индексов:')
+                    self.write_plan(queryset)
+                    transaction.set_rollback(True)
+
+    def query_shapes(self, session_key):
+        week_ago = timezone.now() - timedelta(days=7)
+        return [
+            (
+                'Попытки сессии за неделю (user_statistics)',
+                UserProblemAttempt.objects.filter(
+                    session_key=session_key, created_at__gte=week_ago
+                ).order_by().values('is_correct').annotate(total=Count('id'))
+            ),
+            (
+                'Последние правильные решения (index, global_statistics)',
+                UserProblemAttempt.objects.filter(is_correct=True).order_by('-created_at')[:10]
+            ),
+            (
+                'Уникальные решенные задачи (UserStatistics.solved_problems)',
+                UserProblemAttempt.objects.filter(
+                    session_key=session_key, is_correct=True
+                ).order_by().values('problem').distinct()
+            ),
+            (
+                'Агрегаты по типам задач (rebuild_statistics)',
+                UserProblemAttempt.objects.order_by().values('ege_number').annotate(
+                    total=Count('id'),
+                    correct=Count('id', filter=Q(is_correct=True)),
+                    total_score=Sum('score')
+                )
+            ),
+        ]
+
+    def write_plan(self, queryset):
+        options = {'analyze': True, 'buffers': True} if connection.vendor == 'postgresql' else {}
+        started = time.perf_counter()
+        plan = queryset.explain(**options)
+        elapsed = (time.perf_counter() - started) * 1000
+
+        for line in plan.splitlines():
+            self.stdout.write(f'    {line}')
+        self.stdout.write(f'    ({elapsed:.1f} мс вместе с EXPLAIN)')
+
+    def seed_attempts(self, count, sessions, problems):
+        rng = random.Random()
+        seed_problems(problems, rng)
+        created = seed_sessions(
+            sessions, max(1, count // sessions), 365, rng,
+            progress=lambda created: self.stdout.write(f'Добавлено попыток: {created}')
+        )
+        self.stdout.write(f'Добавлено попыток: {created}')
+
+        if connection.vendor == 'postgresql':
+            table = connection.ops.quote_name(UserProblemAttempt._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {table}')
@@ -0,0 +1,55 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from home.exports import CHUNK_SIZE, export_formats, export_rows, write_csv, write_parquet
+
+
+def parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Дата в формате ГГГГ-ММ-ДД, получено: {value!r}')
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгрузить журнал попыток с номером задачи и правильным ответом в CSV '
+        'или, если установлен pyarrow, в Parquet. Читает потоком, память не '
+        'зависит от объема журнала.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Файл для выгрузки')
+        parser.add_argument(
+            '--format', choices=export_formats(),
+            help='Формат файла (по умолчанию по расширению, иначе csv)'
+        )
+        parser.add_argument('--from', dest='date_from', help='Первый день, ГГГГ-ММ-ДД')
+        parser.add_argument('--to', dest='date_to', help='Последний день, ГГГГ-ММ-ДД')
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Сколько строк читать из базы за раз'
+        )
+
+    def handle(self, *args, **options):
+        date_from = parse_date(options['date_from']) if options['date_from'] else None
+        date_to = parse_date(options['date_to']) if options['date_to'] else None
+        if date_from and date_to and date_from > date_to:
+            raise CommandError('Начало периода позже его конца')
+
+        file_format = options['format'] or (
+            'parquet' if options['output'].endswith('.parquet') else 'csv'
+        )
+        if file_format not in export_formats():
+            raise CommandError('Для выгрузки в Parquet установите pyarrow: pip install pyarrow')
+        rows = export_rows(date_from, date_to, options['chunk_size'])
+
+        if file_format == 'parquet':
+            count = write_parquet(rows, options['output'], options['chunk_size'])
+        else:
+            count = write_csv(rows, options['output'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Выгружено попыток: {count} в {options['output']}"
+        ))
@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from home.importing import FORMATS, detect_format, import_problems
+
+# Сколько ошибок валидации показать построчно
+ERRORS_SHOWN = 20
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортировать задачи из CSV или JSONL (поля text, answer, ege_number и '
+        'необязательный id). Строки с id обновляют существующие задачи.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу .csv или .jsonl')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат файла, если его не видно по расширению'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Сколько задач записывать в одной транзакции'
+        )
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or detect_format(options['path'])
+        if file_format is None:
+            raise CommandError('Не удалось определить формат файла: укажите --format')
+
+        errors = []
+        upserted = inserted = 0
+        started = time.perf_counter()
+
+        try:
+            with open(options['path'], encoding='utf-8', newline='') as stream:
+                for batch_upserted, batch_inserted in import_problems(
+                    stream, file_format, options['batch_size'], errors
+                ):
+                    upserted += batch_upserted
+                    inserted += batch_inserted
+                    self.stdout.write(f'Записано задач: {upserted + inserted}')
+        except OSError as error:
+            raise CommandError(f'Не удалось прочитать файл: {error}')
+
+        elapsed = time.perf_counter() - started
+        for line_number, message in errors[:ERRORS_SHOWN]:
+            self.stderr.write(f'Строка {line_number}: {message}')
+        if len(errors) > ERRORS_SHOWN:
+            self.stderr.write(f'... и еще {len(errors) - ERRORS_SHOWN} ошибок')
+
+        total = upserted + inserted
+        rate = total / elapsed if elapsed > 0 else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано задач: {total} (новых {inserted}, по id {upserted}), '
+            f'пропущено строк: {len(errors)}, {elapsed:.1f} с, {rate:.0f} задач/с'
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from home.statistics import (
+    EGE_NUMBERS, rebuild_global_counters, rebuild_problem_statistics
+)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитать накопительные счетчики статистики из журнала попыток'
+
+    def handle(self, *args, **options):
+        counters = rebuild_global_counters()
+
+        for number in EGE_NUMBERS:
+            total, correct, score = counters.get(number, (0, 0, 0))
+            self.stdout.write(
+                f'Задача {number}: попыток {total}, правильных {correct}, баллов {score}'
+            )
+
+        self.stdout.write(self.style.SUCCESS('Счетчики по типам задач пересчитаны'))
+
+        problems_count = rebuild_problem_statistics()
+        self.stdout.write(self.style.SUCCESS(
+            f'Статистика задач пересчитана: {problems_count}'
+        ))
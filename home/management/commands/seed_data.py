@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from home.seeding import seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Добавить синтетические задачи и сессии с попытками для нагрузочных замеров '
+        '(только для тестовой базы). Статистика пересчитывается после добавления.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--problems', type=int, default=0,
+            help='Сколько задач добавить (поровну по номерам ЕГЭ)'
+        )
+        parser.add_argument(
+            '--sessions', type=int, default=0,
+            help='Сколько сессий добавить'
+        )
+        parser.add_argument(
+            '--attempts-per-session', type=int, default=24,
+            help='Среднее число попыток на сессию'
+        )
+        parser.add_argument(
+            '--days', type=int, default=90,
+            help='За сколько последних дней распределить попытки'
+        )
+        parser.add_argument(
+            '--random-seed', type=int, default=None,
+            help='Зерно генератора для воспроизводимых данных'
+        )
+
+    def handle(self, *args, **options):
+        if not options['problems'] and not options['sessions']:
+            raise CommandError('Укажите --problems и/или --sessions')
+
+        try:
+            problems_count, attempts_count = seed(
+                options['problems'],
+                options['sessions'],
+                options['attempts_per_session'],
+                days=options['days'],
+                random_seed=options['random_seed'],
+                progress=lambda created: self.stdout.write(f'Добавлено попыток: {created}')
+            )
+        except ValueError as error:
+            raise CommandError(error)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Добавлено задач: {problems_count}, сессий: {options['sessions']}, "
+            f"попыток: {attempts_count}"
+        ))
@@ -0,0 +1,55 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:09
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def fill_global_counters(apps, schema_editor):
+    GlobalTypeCounters = apps.get_model('home', 'GlobalTypeCounters')
+    UserProblemAttempt = apps.get_model('home', 'UserProblemAttempt')
+
+    rows = UserProblemAttempt.objects.order_by().values(
+        'problem__ege_number'
+    ).annotate(
+        total=Count('id'),
+        correct=Count('id', filter=Q(is_correct=True)),
+        total_score=Sum('score')
+    )
+    counters = {row['problem__ege_number']: row for row in rows}
+
+    GlobalTypeCounters.objects.bulk_create([
+        GlobalTypeCounters(
+            ege_number=number,
+            total_attempts=counters.get(number, {}).get('total') or 0,
+            correct_attempts=counters.get(number, {}).get('correct') or 0,
+            total_score=counters.get(number, {}).get('total_score') or 0
+        )
+        for number in range(1, 13)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0007_delete_globalstatistics_delete_problemstatistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GlobalTypeCounters',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ege_number', models.IntegerField(choices=[(1, 'Задача 1'), (2, 'Задача 2'), (3, 'Задача 3'), (4, 'Задача 4'), (5, 'Задача 5'), (6, 'Задача 6'), (7, 'Задача 7'), (8, 'Задача 8'), (9, 'Задача 9'), (10, 'Задача 10'), (11, 'Задача 11'), (12, 'Задача 12')], unique=True, verbose_name='Номер в ЕГЭ')),
+                ('total_attempts', models.BigIntegerField(default=0, verbose_name='Всего попыток')),
+                ('correct_attempts', models.BigIntegerField(default=0, verbose_name='Правильных решений')),
+                ('total_score', models.BigIntegerField(default=0, verbose_name='Всего баллов')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Последнее обновление')),
+            ],
+            options={
+                'verbose_name': 'Счетчики по типу задач',
+                'verbose_name_plural': 'Счетчики по типам задач',
+                'ordering': ['ege_number'],
+            },
+        ),
+        migrations.RunPython(fill_global_counters, migrations.RunPython.noop),
+    ]
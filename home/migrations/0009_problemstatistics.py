@@ -0,0 +1,54 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def fill_problem_statistics(apps, schema_editor):
+    ProblemStatistics = apps.get_model('home', 'ProblemStatistics')
+    UserProblemAttempt = apps.get_model('home', 'UserProblemAttempt')
+
+    rows = UserProblemAttempt.objects.order_by().values('problem').annotate(
+        total=Count('id'),
+        correct=Count('id', filter=Q(is_correct=True)),
+        total_score=Sum('score')
+    )
+
+    ProblemStatistics.objects.bulk_create([
+        ProblemStatistics(
+            problem_id=row['problem'],
+            total_attempts=row['total'],
+            correct_attempts=row['correct'],
+            total_score=row['total_score'] or 0,
+            accuracy=row['correct'] * 100 / row['total']
+        )
+        for row in rows.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0008_globaltypecounters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProblemStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_attempts', models.IntegerField(default=0, verbose_name='Всего попыток')),
+                ('correct_attempts', models.IntegerField(default=0, verbose_name='Правильных решений')),
+                ('total_score', models.IntegerField(default=0, verbose_name='Всего баллов')),
+                ('accuracy', models.FloatField(default=0, verbose_name='Точность (%)')),
+                ('problem', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='problem_stats', to='home.problem', verbose_name='Задача')),
+            ],
+            options={
+                'verbose_name': 'Статистика задачи',
+                'verbose_name_plural': 'Статистика задач',
+                'indexes': [models.Index(condition=models.Q(('total_attempts__gt', 0)), fields=['accuracy', 'problem'], name='problemstats_accuracy_idx')],
+            },
+        ),
+        migrations.RunPython(fill_problem_statistics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 6.0.1 on 2026-10-18 19:05
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_attempt_ege_number(apps, schema_editor):
+    Problem = apps.get_model('home', 'Problem')
+    UserProblemAttempt = apps.get_model('home', 'UserProblemAttempt')
+
+    # Миграция атомарна, и AddField держит блокировку таблицы до коммита,
+    # так что пачки ничего бы не дали: номера заполняются одним UPDATE
+    UserProblemAttempt.objects.update(ege_number=Subquery(
+        Problem.objects.filter(id=OuterRef('problem_id')).values('ege_number')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0009_problemstatistics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userproblemattempt',
+            name='ege_number',
+            field=models.IntegerField(choices=[(1, 'Задача 1'), (2, 'Задача 2'), (3, 'Задача 3'), (4, 'Задача 4'), (5, 'Задача 5'), (6, 'Задача 6'), (7, 'Задача 7'), (8, 'Задача 8'), (9, 'Задача 9'), (10, 'Задача 10'), (11, 'Задача 11'), (12, 'Задача 12')], null=True, verbose_name='Номер в ЕГЭ'),
+        ),
+        migrations.RunPython(fill_attempt_ege_number, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='userproblemattempt',
+            name='ege_number',
+            field=models.IntegerField(choices=[(1, 'Задача 1'), (2, 'Задача 2'), (3, 'Задача 3'), (4, 'Задача 4'), (5, 'Задача 5'), (6, 'Задача 6'), (7, 'Задача 7'), (8, 'Задача 8'), (9, 'Задача 9'), (10, 'Задача 10'), (11, 'Задача 11'), (12, 'Задача 12')], verbose_name='Номер в ЕГЭ'),
+        ),
+        migrations.AlterField(
+            model_name='userproblemattempt',
+            name='session_key',
+            field=models.CharField(max_length=40, verbose_name='Ключ сессии'),
+        ),
+        migrations.AddIndex(
+            model_name='userproblemattempt',
+            index=models.Index(fields=['session_key', 'created_at'], name='attempt_session_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userproblemattempt',
+            index=models.Index(condition=models.Q(('is_correct', True)), fields=['session_key', 'problem'], name='attempt_session_solved_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userproblemattempt',
+            index=models.Index(condition=models.Q(('is_correct', True)), fields=['-created_at'], name='attempt_recent_success_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userproblemattempt',
+            index=models.Index(fields=['ege_number', 'is_correct', 'score'], name='attempt_type_outcome_idx'),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def move_type_statistics(apps, schema_editor):
+    UserStatistics = apps.get_model('home', 'UserStatistics')
+    UserTypeStatistics = apps.get_model('home', 'UserTypeStatistics')
+
+    batch = []
+    rows = UserStatistics.objects.order_by().values_list('id', 'problems_by_type')
+    for user_stats_id, problems_by_type in rows.iterator(chunk_size=2000):
+        for number, stats in (problems_by_type or {}).items():
+            batch.append(UserTypeStatistics(
+                user_stats_id=user_stats_id,
+                ege_number=int(number),
+                total_attempts=stats.get('total', 0),
+                correct_attempts=stats.get('correct', 0),
+                total_score=stats.get('score', 0)
+            ))
+        if len(batch) >= 5000:
+            UserTypeStatistics.objects.bulk_create(batch)
+            batch = []
+    UserTypeStatistics.objects.bulk_create(batch)
+
+
+def restore_problems_by_type(apps, schema_editor):
+    UserStatistics = apps.get_model('home', 'UserStatistics')
+    UserTypeStatistics = apps.get_model('home', 'UserTypeStatistics')
+
+    problems_by_type = {}
+    for row in UserTypeStatistics.objects.order_by().values().iterator(chunk_size=5000):
+        problems_by_type.setdefault(row['user_stats_id'], {})[str(row['ege_number'])] = {
+            'total': row['total_attempts'],
+            'correct': row['correct_attempts'],
+            'score': row['total_score']
+        }
+
+    UserStatistics.objects.bulk_update(
+        [
+            UserStatistics(id=user_stats_id, problems_by_type=types)
+            for user_stats_id, types in problems_by_type.items()
+        ],
+        ['problems_by_type'],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0010_attempt_ege_number_and_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTypeStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ege_number', models.IntegerField(choices=[(1, 'Задача 1'), (2, 'Задача 2'), (3, 'Задача 3'), (4, 'Задача 4'), (5, 'Задача 5'), (6, 'Задача 6'), (7, 'Задача 7'), (8, 'Задача 8'), (9, 'Задача 9'), (10, 'Задача 10'), (11, 'Задача 11'), (12, 'Задача 12')], verbose_name='Номер задачи в ЕГЭ')),
+                ('total_attempts', models.IntegerField(default=0, verbose_name='Всего попыток')),
+                ('correct_attempts', models.IntegerField(default=0, verbose_name='Правильных решений')),
+                ('total_score', models.IntegerField(default=0, verbose_name='Всего баллов')),
+                ('user_stats', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='type_statistics', to='home.userstatistics', verbose_name='Статистика пользователя')),
+            ],
+            options={
+                'verbose_name': 'Статистика пользователя по типу задач',
+                'verbose_name_plural': 'Статистика пользователей по типам задач',
+                'ordering': ['user_stats', 'ege_number'],
+                'constraints': [models.UniqueConstraint(fields=('user_stats', 'ege_number'), name='usertypestats_unique_number')],
+            },
+        ),
+        migrations.RunPython(move_type_statistics, restore_problems_by_type),
+        migrations.RemoveField(
+            model_name='userstatistics',
+            name='problems_by_type',
+        ),
+    ]
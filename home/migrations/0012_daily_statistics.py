@@ -0,0 +1,52 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0011_usertypestatistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyProblemStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('ege_number', models.IntegerField(choices=[(1, 'Задача 1'), (2, 'Задача 2'), (3, 'Задача 3'), (4, 'Задача 4'), (5, 'Задача 5'), (6, 'Задача 6'), (7, 'Задача 7'), (8, 'Задача 8'), (9, 'Задача 9'), (10, 'Задача 10'), (11, 'Задача 11'), (12, 'Задача 12')], verbose_name='Номер задачи в ЕГЭ')),
+                ('total_attempts', models.IntegerField(default=0, verbose_name='Всего попыток')),
+                ('correct_attempts', models.IntegerField(default=0, verbose_name='Правильных решений')),
+                ('total_score', models.IntegerField(default=0, verbose_name='Всего баллов')),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='home.problem', verbose_name='Задача')),
+            ],
+            options={
+                'verbose_name': 'Статистика задачи за день',
+                'verbose_name_plural': 'Статистика задач по дням',
+                'ordering': ['-date', 'problem'],
+                'indexes': [models.Index(fields=['date', 'ege_number', 'total_attempts', 'correct_attempts', 'total_score'], name='dailyproblemstats_type_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'problem'), name='dailyproblemstats_unique_day')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyUserStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('ege_number', models.IntegerField(choices=[(1, 'Задача 1'), (2, 'Задача 2'), (3, 'Задача 3'), (4, 'Задача 4'), (5, 'Задача 5'), (6, 'Задача 6'), (7, 'Задача 7'), (8, 'Задача 8'), (9, 'Задача 9'), (10, 'Задача 10'), (11, 'Задача 11'), (12, 'Задача 12')], verbose_name='Номер задачи в ЕГЭ')),
+                ('total_attempts', models.IntegerField(default=0, verbose_name='Всего попыток')),
+                ('correct_attempts', models.IntegerField(default=0, verbose_name='Правильных решений')),
+                ('total_score', models.IntegerField(default=0, verbose_name='Всего баллов')),
+                ('user_stats', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='home.userstatistics', verbose_name='Статистика пользователя')),
+            ],
+            options={
+                'verbose_name': 'Статистика пользователя за день',
+                'verbose_name_plural': 'Статистика пользователей по дням',
+                'ordering': ['user_stats', '-date', 'ege_number'],
+                'indexes': [models.Index(fields=['date', 'user_stats'], name='dailyuserstats_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user_stats', 'date', 'ege_number'), name='dailyuserstats_unique_day')],
+            },
+        ),
+    ]
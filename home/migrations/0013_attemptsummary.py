@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0012_daily_statistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttemptSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_key', models.CharField(max_length=40, verbose_name='Ключ сессии')),
+                ('ege_number', models.IntegerField(choices=[(1, 'Задача 1'), (2, 'Задача 2'), (3, 'Задача 3'), (4, 'Задача 4'), (5, 'Задача 5'), (6, 'Задача 6'), (7, 'Задача 7'), (8, 'Задача 8'), (9, 'Задача 9'), (10, 'Задача 10'), (11, 'Задача 11'), (12, 'Задача 12')], verbose_name='Номер задачи в ЕГЭ')),
+                ('total_attempts', models.IntegerField(default=0, verbose_name='Всего попыток')),
+                ('correct_attempts', models.IntegerField(default=0, verbose_name='Правильных решений')),
+                ('total_score', models.IntegerField(default=0, verbose_name='Всего баллов')),
+                ('compacted_until', models.DateTimeField(verbose_name='Последняя свернутая попытка')),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempt_summaries', to='home.problem', verbose_name='Задача')),
+            ],
+            options={
+                'verbose_name': 'Свернутые попытки',
+                'verbose_name_plural': 'Свернутые попытки',
+                'ordering': ['session_key', 'problem'],
+                'constraints': [models.UniqueConstraint(fields=('session_key', 'problem'), name='attemptsummary_unique_problem')],
+            },
+        ),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 6.0.1 on 2026-10-18 19:40
+#
+# Простой сайта. Миграция выполняется одной транзакцией: первая же команда,
+# RENAME, берет ACCESS EXCLUSIVE на журнал попыток и держит его до COMMIT.
+# Пока журнал копируется в партиции и строятся индексы, проверка вариантов
+# и все страницы, читающие попытки, ждут блокировку. Время растет линейно
+# с размером журнала: оцените его на копии рабочей базы, перед запуском
+# уменьшите журнал командой compact_attempts и остановите веб-процессы
+# (или включите страницу обслуживания) на время миграции.
+# Миграция еще не прогонялась на PostgreSQL: перед выкаткой проверьте ее
+# на копии рабочей базы.
+
+from datetime import date
+
+from django.db import migrations
+
+TABLE = 'home_userproblemattempt'
+OLD_TABLE = 'home_userproblemattempt_unpartitioned'
+SEQUENCE = 'home_userproblemattempt_id_seq'
+# Сколько месяцев вперед создать партиции сразу; дальше их создает
+# команда create_attempt_partitions
+MONTHS_AHEAD = 3
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_attempts(apps, schema_editor):
+    """Перенести журнал попыток в таблицу, секционированную по месяцам created_at.
+
+    Только PostgreSQL: на других базах таблица остается обычной. В первичный
+    ключ секционированной таблицы обязан входить ключ секционирования, поэтому
+    он становится (id, created_at); уникальность id по-прежнему дает
+    последовательность.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    UserProblemAttempt = apps.get_model('home', 'UserProblemAttempt')
+    quote = schema_editor.quote_name
+    execute = schema_editor.execute
+
+    # Не вставать в очередь за долгими транзакциями: пока RENAME ждет
+    # блокировку, за ним ждут и все остальные запросы к журналу
+    execute("SET LOCAL lock_timeout = '10s'")
+    execute(f'ALTER TABLE {quote(TABLE)} RENAME TO {quote(OLD_TABLE)}')
+    # Без INCLUDING IDENTITY: до PostgreSQL 17 identity-колонки у секционированных
+    # таблиц не поддерживаются, id получит обычную последовательность
+    execute(
+        f'CREATE TABLE {quote(TABLE)} '
+        f'(LIKE {quote(OLD_TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+        f'PARTITION BY RANGE (created_at)'
+    )
+    execute(f'ALTER TABLE {quote(TABLE)} ADD PRIMARY KEY (id, created_at)')
+    execute(
+        f'ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(TABLE + "_problem_id_fk")} '
+        f'FOREIGN KEY (problem_id) REFERENCES {quote("home_problem")} (id) '
+        f'DEFERRABLE INITIALLY DEFERRED'
+    )
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'SELECT min(created_at), max(id) FROM {quote(OLD_TABLE)}')
+        first_created_at, max_id = cursor.fetchone()
+
+    today = date.today()
+    month = date((first_created_at or today).year, (first_created_at or today).month, 1)
+    last_month = add_months(date(today.year, today.month, 1), MONTHS_AHEAD)
+    while month <= last_month:
+        execute(
+            f'CREATE TABLE {quote(f"{TABLE}_y{month.year}m{month.month:02d}")} '
+            f'PARTITION OF {quote(TABLE)} '
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') "
+            f"TO ('{add_months(month, 1).isoformat()} 00:00:00+00')"
+        )
+        month = add_months(month, 1)
+    # Страховка на случай, если команду не запускали и месяц без партиции
+    execute(f'CREATE TABLE {quote(TABLE + "_default")} PARTITION OF {quote(TABLE)} DEFAULT')
+
+    execute(f'INSERT INTO {quote(TABLE)} SELECT * FROM {quote(OLD_TABLE)}')
+    # Вместе со старой таблицей удаляются ее индексы и identity-последовательность
+    execute(f'DROP TABLE {quote(OLD_TABLE)}')
+
+    execute(f'CREATE SEQUENCE {quote(SEQUENCE)} OWNED BY {quote(TABLE)}.id')
+    execute('SELECT setval(%s, %s, %s)', [SEQUENCE, max_id or 1, max_id is not None])
+    execute(f"ALTER TABLE {quote(TABLE)} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')")
+
+    # Индексы на родительской таблице создаются во всех партициях
+    execute(f'CREATE INDEX {quote(TABLE + "_problem_id_idx")} ON {quote(TABLE)} (problem_id)')
+    for index in UserProblemAttempt._meta.indexes:
+        schema_editor.add_index(UserProblemAttempt, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0013_attemptsummary'),
+    ]
+
+    operations = [
+        # Состояние моделей не меняется: для Django это та же таблица с первичным ключом id
+        migrations.RunPython(partition_attempts, migrations.RunPython.noop),
+    ]
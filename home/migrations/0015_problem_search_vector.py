@@ -0,0 +1,52 @@
+# Generated by Django 6.0.1 on 2026-10-18 21:10
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+INDEX = django.contrib.postgres.indexes.GinIndex(
+    fields=['search_vector'], name='problem_search_vector_gin'
+)
+
+
+def add_search_index(apps, schema_editor):
+    """GIN-индекс и векторы существующих задач; только PostgreSQL"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    Problem = apps.get_model('home', 'Problem')
+    Problem.objects.update(search_vector=django.contrib.postgres.search.SearchVector(
+        'text', config='russian'
+    ))
+    schema_editor.add_index(Problem, INDEX)
+
+
+def remove_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.remove_index(apps.get_model('home', 'Problem'), INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0014_partition_attempts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        # На SQLite GIN-индекса нет, поэтому в базе он создается только на PostgreSQL
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name='problem', index=INDEX),
+            ],
+            database_operations=[
+                migrations.RunPython(add_search_index, remove_search_index),
+            ],
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 6.0.1 on 2026-10-18 22:05
+
+from django.db import migrations, models, transaction
+from django.db.models import Count, Max, Min, Sum
+
+COUNTERS = ['total_attempts', 'correct_attempts', 'total_score']
+
+
+def merge_rows(model, key_fields, keep_id, user_stats_ids):
+    """Сложить счетчики строк model всех дублей в строки keep_id"""
+    rows = model.objects.filter(user_stats_id__in=user_stats_ids)
+    totals = list(rows.order_by().values(*key_fields).annotate(
+        **{counter: Sum(counter) for counter in COUNTERS}
+    ))
+    rows.delete()
+    model.objects.bulk_create([model(user_stats_id=keep_id, **row) for row in totals])
+
+
+def merge_duplicate_sessions(apps, schema_editor):
+    """Слить строки статистики одной сессии в самую раннюю.
+
+    Без уникального ключа двойная отправка первого варианта могла создать
+    две строки; попытки каждой из них учтены, поэтому счетчики складываются.
+    """
+    UserStatistics = apps.get_model('home', 'UserStatistics')
+    UserTypeStatistics = apps.get_model('home', 'UserTypeStatistics')
+    DailyUserStatistics = apps.get_model('home', 'DailyUserStatistics')
+
+    duplicates = UserStatistics.objects.order_by().values('session_key').annotate(
+        rows=Count('id'), keep_id=Min('id')
+    ).filter(rows__gt=1)
+
+    # Каждая сессия сливается в своей транзакции: прерванная миграция
+    # не оставит удаленных строк без пересозданных сумм
+    for duplicate in list(duplicates):
+        with transaction.atomic(using=schema_editor.connection.alias):
+            keep_id = duplicate['keep_id']
+            rows = UserStatistics.objects.select_for_update().filter(
+                session_key=duplicate['session_key']
+            )
+            user_stats_ids = list(rows.values_list('id', flat=True))
+
+            totals = UserStatistics.objects.filter(id__in=user_stats_ids).aggregate(
+                last_activity=Max('last_activity'),
+                **{counter: Sum(counter) for counter in COUNTERS}
+            )
+            merge_rows(UserTypeStatistics, ['ege_number'], keep_id, user_stats_ids)
+            merge_rows(DailyUserStatistics, ['date', 'ege_number'], keep_id, user_stats_ids)
+            UserStatistics.objects.filter(id__in=user_stats_ids).exclude(id=keep_id).delete()
+            # update, а не save: auto_now перезаписал бы last_activity
+            UserStatistics.objects.filter(id=keep_id).update(**totals)
+
+
+class Migration(migrations.Migration):
+    # Слияния коммитятся до ALTER TABLE: на PostgreSQL отложенные проверки
+    # внешних ключей после удаления дублей не дали бы изменить таблицу
+    atomic = False
+
+    dependencies = [
+        ('home', '0015_problem_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_sessions, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='userstatistics',
+            name='session_key',
+            field=models.CharField(max_length=40, unique=True, verbose_name='Ключ сессии'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:15
+
+from django.db import migrations
+
+TABLE = 'home_problem'
+TRIGGER = 'problem_search_vector_update'
+
+
+def create_search_trigger(apps, schema_editor):
+    """Триггер, который строит search_vector из text в самой базе; только PostgreSQL.
+
+    Вектор обновляется при любой вставке и изменении text — в том числе
+    через bulk_create, QuerySet.update() и upsert импорта, которые минуют
+    Problem.save.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    quote = schema_editor.quote_name
+    schema_editor.execute(
+        f'CREATE TRIGGER {quote(TRIGGER)} BEFORE INSERT OR UPDATE OF text ON {quote(TABLE)} '
+        f"FOR EACH ROW EXECUTE FUNCTION tsvector_update_trigger(search_vector, 'pg_catalog.russian', text)"
+    )
+    schema_editor.execute(
+        f"UPDATE {quote(TABLE)} SET search_vector = to_tsvector('pg_catalog.russian', text)"
+    )
+
+
+def drop_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    quote = schema_editor.quote_name
+    schema_editor.execute(f'DROP TRIGGER IF EXISTS {quote(TRIGGER)} ON {quote(TABLE)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0016_unique_user_statistics_session'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_trigger, drop_search_trigger),
+    ]
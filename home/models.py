@@ -1,9 +1,59 @@
-from django.db import models
-import random
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+from django.core.exceptions import ValidationError
+from django.db import connections, models
 from django.utils import timezone
-from django.db.models import Count, Sum, Avg, F, FloatField
+from django.db.models import Count, Sum, Avg, F, Q, Exists, OuterRef, FloatField
 from django.db.models.functions import Cast
 
+# Словарь PostgreSQL для разбора условий задач
+SEARCH_CONFIG = 'russian'
+
+
+class ProblemQuerySet(models.QuerySet):
+    def with_stats(self):
+        """Задачи вместе с накопленной статистикой (Problem.stats) одним запросом"""
+        return self.select_related('problem_stats')
+
+    def ranked_by_accuracy(self):
+        """Решавшиеся задачи в порядке возрастания точности"""
+        return self.with_stats().filter(
+            problem_stats__total_attempts__gt=0
+        ).order_by('problem_stats__accuracy', 'id')
+
+    def hardest(self, limit):
+        return self.ranked_by_accuracy()[:limit]
+
+    def easiest(self, limit):
+        return self.ranked_by_accuracy().reverse()[:limit]
+
+    def with_attempt_history(self):
+        """Задачи, по которым есть попытки или свернутые итоги попыток"""
+        return self.filter(
+            Exists(UserProblemAttempt.objects.filter(problem=OuterRef('pk')))
+            | Exists(AttemptSummary.objects.filter(problem=OuterRef('pk')))
+        )
+
+    def search(self, query):
+        """Задачи, в условии которых есть слова запроса, от самых релевантных.
+
+        На PostgreSQL — полнотекстовый поиск по GIN-индексу с учетом словоформ,
+        на других базах — поиск подстроки.
+        """
+        if connections[self.db].vendor != 'postgresql':
+            return self.filter(text__icontains=query)
+
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        return self.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-rank', 'id')
+
+
+class ProblemManager(models.Manager.from_queryset(ProblemQuerySet)):
+    def get_queryset(self):
+        # Вектор нужен только в условии поиска, в выборки задач его не тянем
+        return super().get_queryset().defer('search_vector')
+
 
 class Problem(models.Model):
     text = models.TextField(verbose_name="Текст задачи")
@@ -13,20 +63,55 @@ class Problem(models.Model):
         choices=[(i, f"Задача {i}") for i in range(1, 13)],
         default=1
     )
+    # Только PostgreSQL: заполняет триггер из миграции 0017 при любой вставке
+    # и изменении text, включая bulk_create, update() и upsert
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ProblemManager()
 
     class Meta:
         ordering = ['ege_number', 'id']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='problem_search_vector_gin'),
+        ]
 
     def __str__(self):
         return f"Задача {self.ege_number} (#{self.id})"
 
+    def clean(self):
+        self.check_ege_number_change()
+
+    def check_ege_number_change(self):
+        """Номер задачи с попытками менять нельзя.
+
+        Номер скопирован в попытки, свернутые итоги и дневную статистику, а
+        счетчики по типам уже разнесены по старому номеру: после смены они
+        разошлись бы с журналом и пересчетами.
+        """
+        if self.pk is None or self._state.adding:
+            return
+        changed = Problem.objects.filter(pk=self.pk).exclude(ege_number=self.ege_number)
+        if changed.with_attempt_history().exists():
+            raise ValidationError({
+                'ege_number': 'По задаче уже есть попытки: номер изменить нельзя, '
+                              'добавьте задачу заново с новым номером'
+            })
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'ege_number' in update_fields:
+            self.check_ege_number_change()
+        super().save(*args, **kwargs)
+
     @property
     def stats(self):
-        """Статистика задачи через агрегацию"""
-        attempts = UserProblemAttempt.objects.filter(problem=self)
+        """Статистика задачи из накопительных счетчиков"""
+        try:
+            problem_stats = self.problem_stats
+        except ProblemStatistics.DoesNotExist:
+            problem_stats = None
 
-        total_attempts = attempts.count()
-        if total_attempts == 0:
+        if problem_stats is None or problem_stats.total_attempts == 0:
             return {
                 'total_attempts': 0,
                 'correct_attempts': 0,
@@ -35,8 +120,9 @@ class Problem(models.Model):
                 'average_score': 0
             }
 
-        correct_attempts = attempts.filter(is_correct=True).count()
-        total_score = attempts.aggregate(total=Sum('score'))['total'] or 0
+        total_attempts = problem_stats.total_attempts
+        correct_attempts = problem_stats.correct_attempts
+        total_score = problem_stats.total_score
 
         accuracy = 0
         if total_attempts > 0:
@@ -56,11 +142,13 @@ class Problem(models.Model):
 
     @staticmethod
     def create_full_variant():
+        from .variants import pick_variant_problems
+
+        picked = {problem.ege_number: problem for problem in pick_variant_problems()}
         variant_problems = []
         for number in range(1, 13):
-            problems = Problem.objects.filter(ege_number=number)
-            if problems.exists():
-                variant_problems.append(random.choice(list(problems)))
+            if number in picked:
+                variant_problems.append(picked[number])
             else:
                 variant_problems.append(Problem(
                     text=f"Задача №{number} (в разработке)",
@@ -70,12 +158,52 @@ class Problem(models.Model):
         return variant_problems
 
 
+class ProblemStatistics(models.Model):
+    """Накопительная статистика решений конкретной задачи"""
+    problem = models.OneToOneField(
+        Problem,
+        on_delete=models.CASCADE,
+        related_name='problem_stats',
+        verbose_name="Задача"
+    )
+    total_attempts = models.IntegerField(
+        default=0,
+        verbose_name="Всего попыток"
+    )
+    correct_attempts = models.IntegerField(
+        default=0,
+        verbose_name="Правильных решений"
+    )
+    total_score = models.IntegerField(
+        default=0,
+        verbose_name="Всего баллов"
+    )
+    accuracy = models.FloatField(
+        default=0,
+        verbose_name="Точность (%)"
+    )
+
+    class Meta:
+        verbose_name = "Статистика задачи"
+        verbose_name_plural = "Статистика задач"
+        indexes = [
+            models.Index(
+                fields=['accuracy', 'problem'],
+                condition=Q(total_attempts__gt=0),
+                name='problemstats_accuracy_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Статистика задачи #{self.problem_id}"
+
+
 class UserStatistics(models.Model):
     """Статистика анонимного пользователя"""
     session_key = models.CharField(
         max_length=40,
         verbose_name="Ключ сессии",
-        db_index=True
+        unique=True
     )
     created_at = models.DateTimeField(
         auto_now_add=True,
@@ -100,13 +228,6 @@ class UserStatistics(models.Model):
         verbose_name="Всего баллов"
     )
 
-    # Статистика по типам задач
-    problems_by_type = models.JSONField(
-        default=dict,
-        verbose_name="Статистика по типам задач",
-        help_text="Формат: {'1': {'total': 10, 'correct': 8}, ...}"
-    )
-
     class Meta:
         verbose_name = "Статистика пользователя"
         verbose_name_plural = "Статистика пользователей"
@@ -131,67 +252,153 @@ class UserStatistics(models.Model):
 
     @property
     def solved_problems(self):
-        """Количество уникальных решенных задач"""
-        return UserProblemAttempt.objects.filter(
+        """Количество уникальных решенных задач, включая свернутые старые попытки"""
+        recent = UserProblemAttempt.objects.filter(
             session_key=self.session_key,
             is_correct=True
-        ).values('problem').distinct().count()
+        ).order_by().values('problem')
+        compacted = AttemptSummary.objects.filter(
+            session_key=self.session_key,
+            correct_attempts__gt=0
+        ).order_by().values('problem')
+        return recent.union(compacted).count()
 
     def update_statistics(self, problem, is_correct, score=1):
         """Обновить статистику после решения задачи"""
-        self.total_attempts += 1
-        if is_correct:
-            self.correct_attempts += 1
-            self.total_score += score
-
-        # Обновляем статистику по типу задачи
-        problem_type = str(problem.ege_number)
-        if problem_type not in self.problems_by_type:
-            self.problems_by_type[problem_type] = {
-                'total': 0,
-                'correct': 0,
-                'score': 0
-            }
+        self._increment({problem.ege_number: (1, 1 if is_correct else 0, score if is_correct else 0)})
 
-        self.problems_by_type[problem_type]['total'] += 1
-        if is_correct:
-            self.problems_by_type[problem_type]['correct'] += 1
-            self.problems_by_type[problem_type]['score'] += score
+    def record_attempts(self, attempts):
+        """Обновить статистику после проверки нескольких задач"""
+        type_deltas = {}
+        for attempt in attempts:
+            total, correct, score = type_deltas.get(attempt.ege_number, (0, 0, 0))
+            if attempt.is_correct:
+                correct += 1
+                score += attempt.score
+            type_deltas[attempt.ege_number] = (total + 1, correct, score)
+        self._increment(type_deltas)
 
-        self.save()
+    def _increment(self, type_deltas):
+        """Прибавить дельты (попытки, правильные, баллы) по типам задач на стороне базы.
+
+        Параллельные проверки одной сессии не теряют обновлений: строки
+        не перечитываются в Python, а UPDATE пишет только счетчики.
+        """
+        from .statistics import counter_changes
+
+        if not type_deltas:
+            return
+
+        UserStatistics.objects.filter(pk=self.pk).update(
+            total_attempts=F('total_attempts') + sum(delta[0] for delta in type_deltas.values()),
+            correct_attempts=F('correct_attempts') + sum(delta[1] for delta in type_deltas.values()),
+            total_score=F('total_score') + sum(delta[2] for delta in type_deltas.values()),
+            # update() не вызывает auto_now
+            last_activity=timezone.now()
+        )
+
+        UserTypeStatistics.objects.bulk_create(
+            [UserTypeStatistics(user_stats=self, ege_number=number) for number in type_deltas],
+            ignore_conflicts=True
+        )
+        UserTypeStatistics.objects.filter(
+            user_stats=self, ege_number__in=type_deltas
+        ).update(**counter_changes('ege_number', type_deltas))
+
+        self.refresh_from_db(fields=[
+            'total_attempts', 'correct_attempts', 'total_score', 'last_activity'
+        ])
+        self._type_statistics = None
+
+    def type_statistics_map(self):
+        """Счетчики сессии по номерам ЕГЭ одним запросом: {номер: (попытки, правильные, баллы)}"""
+        type_statistics = getattr(self, '_type_statistics', None)
+        if type_statistics is None:
+            type_statistics = {}
+            if self.pk:
+                type_statistics = {
+                    row['ege_number']: (
+                        row['total_attempts'], row['correct_attempts'], row['total_score']
+                    )
+                    for row in UserTypeStatistics.objects.filter(user_stats_id=self.pk).values(
+                        'ege_number', 'total_attempts', 'correct_attempts', 'total_score'
+                    )
+                }
+            self._type_statistics = type_statistics
+        return type_statistics
 
     def get_type_statistics(self, ege_number):
         """Получить статистику по конкретному типу задач"""
-        stats = self.problems_by_type.get(str(ege_number), {
-            'total': 0,
-            'correct': 0,
-            'score': 0
-        })
+        total, correct, score = self.type_statistics_map().get(int(ege_number), (0, 0, 0))
 
         accuracy = 0
-        if stats['total'] > 0:
-            accuracy = round((stats['correct'] / stats['total']) * 100, 1)
+        if total > 0:
+            accuracy = round((correct / total) * 100, 1)
 
         return {
-            'total': stats['total'],
-            'correct': stats['correct'],
-            'score': stats['score'],
+            'total': total,
+            'correct': correct,
+            'score': score,
             'accuracy': accuracy
         }
 
 
+class UserTypeStatistics(models.Model):
+    """Статистика сессии по одному номеру ЕГЭ"""
+    user_stats = models.ForeignKey(
+        UserStatistics,
+        on_delete=models.CASCADE,
+        related_name='type_statistics',
+        verbose_name="Статистика пользователя"
+    )
+    ege_number = models.IntegerField(
+        choices=[(i, f"Задача {i}") for i in range(1, 13)],
+        verbose_name="Номер задачи в ЕГЭ"
+    )
+    total_attempts = models.IntegerField(
+        default=0,
+        verbose_name="Всего попыток"
+    )
+    correct_attempts = models.IntegerField(
+        default=0,
+        verbose_name="Правильных решений"
+    )
+    total_score = models.IntegerField(
+        default=0,
+        verbose_name="Всего баллов"
+    )
+
+    class Meta:
+        verbose_name = "Статистика пользователя по типу задач"
+        verbose_name_plural = "Статистика пользователей по типам задач"
+        ordering = ['user_stats', 'ege_number']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user_stats', 'ege_number'],
+                name='usertypestats_unique_number'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Задача {self.ege_number}: {self.correct_attempts}/{self.total_attempts}"
+
+
 class UserProblemAttempt(models.Model):
     """Попытка решения конкретной задачи пользователем"""
     session_key = models.CharField(
         max_length=40,
-        verbose_name="Ключ сессии",
-        db_index=True
+        verbose_name="Ключ сессии"
     )
     problem = models.ForeignKey(
         Problem,
         on_delete=models.CASCADE,
         verbose_name="Задача"
     )
+    # Копия Problem.ege_number: агрегаты по типам считаются без JOIN
+    ege_number = models.IntegerField(
+        verbose_name="Номер в ЕГЭ",
+        choices=[(i, f"Задача {i}") for i in range(1, 13)]
+    )
     is_correct = models.BooleanField(
         verbose_name="Правильно решена"
     )
@@ -211,7 +418,211 @@ class UserProblemAttempt(models.Model):
         verbose_name = "Попытка решения"
         verbose_name_plural = "Попытки решений"
         ordering = ['-created_at']
+        indexes = [
+            # Попытки сессии за период и история по порядку
+            models.Index(
+                fields=['session_key', 'created_at'],
+                name='attempt_session_created_idx'
+            ),
+            # Уникальные решенные задачи сессии
+            models.Index(
+                fields=['session_key', 'problem'],
+                condition=Q(is_correct=True),
+                name='attempt_session_solved_idx'
+            ),
+            # Последние правильные решения на главной и в общей статистике
+            models.Index(
+                fields=['-created_at'],
+                condition=Q(is_correct=True),
+                name='attempt_recent_success_idx'
+            ),
+            # Агрегаты по типам задач без чтения самой таблицы
+            models.Index(
+                fields=['ege_number', 'is_correct', 'score'],
+                name='attempt_type_outcome_idx'
+            ),
+        ]
 
     def __str__(self):
         status = "✓" if self.is_correct else "✗"
-        return f"{status} {self.session_key[:8]} - Задача {self.problem.ege_number}"
\ No newline at end of file
+        return f"{status} {self.session_key[:8]} - Задача {self.ege_number}"
+
+
+class AttemptSummary(models.Model):
+    """Свернутые старые попытки сессии по задаче (см. команду compact_attempts)"""
+    session_key = models.CharField(
+        max_length=40,
+        verbose_name="Ключ сессии"
+    )
+    problem = models.ForeignKey(
+        Problem,
+        on_delete=models.CASCADE,
+        related_name='attempt_summaries',
+        verbose_name="Задача"
+    )
+    ege_number = models.IntegerField(
+        choices=[(i, f"Задача {i}") for i in range(1, 13)],
+        verbose_name="Номер задачи в ЕГЭ"
+    )
+    total_attempts = models.IntegerField(
+        default=0,
+        verbose_name="Всего попыток"
+    )
+    correct_attempts = models.IntegerField(
+        default=0,
+        verbose_name="Правильных решений"
+    )
+    total_score = models.IntegerField(
+        default=0,
+        verbose_name="Всего баллов"
+    )
+    compacted_until = models.DateTimeField(
+        verbose_name="Последняя свернутая попытка"
+    )
+
+    class Meta:
+        verbose_name = "Свернутые попытки"
+        verbose_name_plural = "Свернутые попытки"
+        ordering = ['session_key', 'problem']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['session_key', 'problem'],
+                name='attemptsummary_unique_problem'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.session_key[:8]} - задача #{self.problem_id}: {self.correct_attempts}/{self.total_attempts}"
+
+
+class GlobalTypeCounters(models.Model):
+    """Накопительные счетчики попыток по номеру задачи ЕГЭ"""
+    ege_number = models.IntegerField(
+        verbose_name="Номер в ЕГЭ",
+        choices=[(i, f"Задача {i}") for i in range(1, 13)],
+        unique=True
+    )
+    total_attempts = models.BigIntegerField(
+        default=0,
+        verbose_name="Всего попыток"
+    )
+    correct_attempts = models.BigIntegerField(
+        default=0,
+        verbose_name="Правильных решений"
+    )
+    total_score = models.BigIntegerField(
+        default=0,
+        verbose_name="Всего баллов"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Последнее обновление"
+    )
+
+    class Meta:
+        verbose_name = "Счетчики по типу задач"
+        verbose_name_plural = "Счетчики по типам задач"
+        ordering = ['ege_number']
+
+    def __str__(self):
+        return f"Счетчики задачи {self.ege_number}"
+
+
+class DailyProblemStatistics(models.Model):
+    """Попытки по задаче за один день: основа статистики за период"""
+    date = models.DateField(
+        verbose_name="Дата"
+    )
+    problem = models.ForeignKey(
+        Problem,
+        on_delete=models.CASCADE,
+        related_name='daily_stats',
+        verbose_name="Задача"
+    )
+    ege_number = models.IntegerField(
+        choices=[(i, f"Задача {i}") for i in range(1, 13)],
+        verbose_name="Номер задачи в ЕГЭ"
+    )
+    total_attempts = models.IntegerField(
+        default=0,
+        verbose_name="Всего попыток"
+    )
+    correct_attempts = models.IntegerField(
+        default=0,
+        verbose_name="Правильных решений"
+    )
+    total_score = models.IntegerField(
+        default=0,
+        verbose_name="Всего баллов"
+    )
+
+    class Meta:
+        verbose_name = "Статистика задачи за день"
+        verbose_name_plural = "Статистика задач по дням"
+        ordering = ['-date', 'problem']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'problem'],
+                name='dailyproblemstats_unique_day'
+            ),
+        ]
+        indexes = [
+            # Суммы по типам задач за период
+            models.Index(
+                fields=['date', 'ege_number', 'total_attempts', 'correct_attempts', 'total_score'],
+                name='dailyproblemstats_type_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Задача #{self.problem_id} за {self.date}: {self.correct_attempts}/{self.total_attempts}"
+
+
+class DailyUserStatistics(models.Model):
+    """Попытки сессии по номеру ЕГЭ за один день"""
+    user_stats = models.ForeignKey(
+        UserStatistics,
+        on_delete=models.CASCADE,
+        related_name='daily_stats',
+        verbose_name="Статистика пользователя"
+    )
+    date = models.DateField(
+        verbose_name="Дата"
+    )
+    ege_number = models.IntegerField(
+        choices=[(i, f"Задача {i}") for i in range(1, 13)],
+        verbose_name="Номер задачи в ЕГЭ"
+    )
+    total_attempts = models.IntegerField(
+        default=0,
+        verbose_name="Всего попыток"
+    )
+    correct_attempts = models.IntegerField(
+        default=0,
+        verbose_name="Правильных решений"
+    )
+    total_score = models.IntegerField(
+        default=0,
+        verbose_name="Всего баллов"
+    )
+
+    class Meta:
+        verbose_name = "Статистика пользователя за день"
+        verbose_name_plural = "Статистика пользователей по дням"
+        ordering = ['user_stats', '-date', 'ege_number']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user_stats', 'date', 'ege_number'],
+                name='dailyuserstats_unique_day'
+            ),
+        ]
+        indexes = [
+            # Число активных пользователей за период
+            models.Index(
+                fields=['date', 'user_stats'],
+                name='dailyuserstats_date_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Сессия #{self.user_stats_id}, задача {self.ege_number} за {self.date}"
@@ -0,0 +1,119 @@
+"""Помесячные партиции журнала попыток в PostgreSQL (см. миграцию 0014)"""
+from datetime import date
+
+from django.db import connection, transaction
+
+from .models import UserProblemAttempt
+
+ATTEMPT_TABLE = UserProblemAttempt._meta.db_table
+DEFAULT_PARTITION = f'{ATTEMPT_TABLE}_default'
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def attempt_partition_name(month):
+    return f'{ATTEMPT_TABLE}_y{month.year}m{month.month:02d}'
+
+
+def is_attempt_table_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [ATTEMPT_TABLE])
+        row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def create_attempt_partition(month):
+    """Создать партицию попыток за месяц, если ее еще нет. True, если создана.
+
+    Если попытки этого месяца уже попали в партицию DEFAULT, PostgreSQL не
+    даст создать партицию поверх них. Тогда партиция собирается отдельной
+    таблицей, строки переносятся в нее из DEFAULT и она присоединяется —
+    все в одной транзакции.
+    """
+    name = attempt_partition_name(month)
+    quote = connection.ops.quote_name
+    # Границы в UTC: created_at хранится как timestamptz
+    start = f'{month.isoformat()} 00:00:00+00'
+    end = f'{add_months(month, 1).isoformat()} 00:00:00+00'
+    bounds = f"FOR VALUES FROM ('{start}') TO ('{end}')"
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        if cursor.fetchone()[0] is not None:
+            return False
+
+        cursor.execute(
+            f'SELECT EXISTS (SELECT 1 FROM {quote(DEFAULT_PARTITION)} '
+            f'WHERE created_at >= %s AND created_at < %s)',
+            [start, end]
+        )
+        if not cursor.fetchone()[0]:
+            cursor.execute(f'CREATE TABLE {quote(name)} PARTITION OF {quote(ATTEMPT_TABLE)} {bounds}')
+            return True
+
+        cursor.execute(
+            f'CREATE TABLE {quote(name)} '
+            f'(LIKE {quote(ATTEMPT_TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        )
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM {quote(DEFAULT_PARTITION)} '
+            f'WHERE created_at >= %s AND created_at < %s RETURNING *) '
+            f'INSERT INTO {quote(name)} SELECT * FROM moved',
+            [start, end]
+        )
+        # Индексы секционированной таблицы PostgreSQL создает на партиции сам
+        cursor.execute(f'ALTER TABLE {quote(ATTEMPT_TABLE)} ATTACH PARTITION {quote(name)} {bounds}')
+    return True
+
+
+def list_attempt_partitions():
+    """Месячные партиции попыток: [(имя, первый день месяца)] по возрастанию"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = %s",
+            [ATTEMPT_TABLE]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    prefix = f'{ATTEMPT_TABLE}_y'
+    for name in names:
+        if not name.startswith(prefix):
+            continue
+        year, month = name[len(prefix):].split('m')
+        partitions.append((name, date(int(year), int(month), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def expired_attempt_partitions(horizon):
+    """Месячные партиции, целиком лежащие раньше момента horizon"""
+    return [
+        (name, month) for name, month in list_attempt_partitions()
+        if add_months(month, 1) <= horizon.date()
+    ]
+
+
+def detach_attempt_partition(name):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'ALTER TABLE {connection.ops.quote_name(ATTEMPT_TABLE)} '
+            f'DETACH PARTITION {connection.ops.quote_name(name)}'
+        )
+
+
+def drop_attempt_partition(name):
+    """Удалить партицию целиком: операция над метаданными вместо DELETE по строкам"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE {connection.ops.quote_name(name)}')
@@ -0,0 +1,144 @@
+"""Синтетические данные для замеров: задачи, сессии и их попытки"""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    Problem, UserStatistics, UserTypeStatistics, UserProblemAttempt
+)
+from .statistics import (
+    EGE_NUMBERS, rebuild_global_counters, rebuild_problem_statistics, rebuild_daily_statistics
+)
+from .variants import invalidate_problem_id_index
+
+BATCH_SIZE = 10000
+SEED_SESSION_PREFIX = 'seed'
+
+
+def type_accuracy(ege_number):
+    """Доля правильных ответов по номеру: первые задачи решают чаще"""
+    return 0.85 - (ege_number - 1) * 0.05
+
+
+@contextmanager
+def explicit_created_at():
+    """Разрешить задавать created_at попыток: auto_now_add перезаписал бы его"""
+    field = UserProblemAttempt._meta.get_field('created_at')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def seed_problems(count, rng):
+    """Добавить count задач, поровну по номерам ЕГЭ"""
+    problems = []
+    for i in range(count):
+        ege_number = EGE_NUMBERS[i % len(EGE_NUMBERS)]
+        problems.append(Problem(
+            ege_number=ege_number,
+            text=f'Синтетическая задача {ege_number}.{i}',
+            answer=rng.randint(1, 100)
+        ))
+    Problem.objects.bulk_create(problems, batch_size=BATCH_SIZE)
+    invalidate_problem_id_index()
+    return len(problems)
+
+
+def seed_sessions(sessions, attempts_per_session, days, rng, progress=None):
+    """Добавить сессии с попытками и пересчитать всю статистику.
+
+    Число попыток сессии распределено по Парето со средним
+    attempts_per_session: большинство решает один-два варианта, немногие — сотни задач.
+    Попытки идут вариантами по 12 задач и распределены по последним days дням.
+    """
+    problems_by_number = {number: [] for number in EGE_NUMBERS}
+    for problem_id, ege_number in Problem.objects.values_list('id', 'ege_number'):
+        problems_by_number[ege_number].append(problem_id)
+    if not any(problems_by_number.values()):
+        raise ValueError('Нет задач: сначала добавьте задачи')
+
+    now = timezone.now()
+    offset = UserStatistics.objects.filter(session_key__startswith=SEED_SESSION_PREFIX).count()
+    attempts = []
+    users = []
+    created = 0
+
+    def flush():
+        # bulk_create возвращает первичные ключи на PostgreSQL и SQLite 3.35+
+        UserStatistics.objects.bulk_create([user_stats for user_stats, type_counters in users])
+        UserTypeStatistics.objects.bulk_create([
+            UserTypeStatistics(
+                user_stats=user_stats,
+                ege_number=ege_number,
+                total_attempts=total,
+                correct_attempts=correct,
+                total_score=score
+            )
+            for user_stats, type_counters in users
+            for ege_number, (total, correct, score) in type_counters.items()
+        ], batch_size=BATCH_SIZE)
+        UserProblemAttempt.objects.bulk_create(attempts, batch_size=BATCH_SIZE)
+        return len(attempts)
+
+    with explicit_created_at():
+        for index in range(offset, offset + sessions):
+            session_key = f'{SEED_SESSION_PREFIX}{index:036d}'
+            # Парето с alpha=2 имеет среднее 2 * scale
+            count = max(1, int(rng.paretovariate(2) * attempts_per_session / 2))
+            started_at = now - timedelta(seconds=rng.uniform(0, days * 24 * 60 * 60))
+            user_stats = UserStatistics(session_key=session_key)
+            type_counters = {}
+
+            for position in range(count):
+                ege_number = EGE_NUMBERS[position % len(EGE_NUMBERS)]
+                if not problems_by_number[ege_number]:
+                    continue
+                is_correct = rng.random() < type_accuracy(ege_number)
+                score = 1 if is_correct else 0
+                # Вариант из 12 задач за 12 минут, варианты через полчаса
+                created_at = min(now, started_at + timedelta(minutes=position // 12 * 30 + position % 12))
+                attempts.append(UserProblemAttempt(
+                    session_key=session_key,
+                    problem_id=rng.choice(problems_by_number[ege_number]),
+                    ege_number=ege_number,
+                    is_correct=is_correct,
+                    user_answer=0,
+                    score=score,
+                    created_at=created_at
+                ))
+
+                user_stats.total_attempts += 1
+                user_stats.correct_attempts += score
+                user_stats.total_score += score
+                total, correct, total_score = type_counters.get(ege_number, (0, 0, 0))
+                type_counters[ege_number] = (total + 1, correct + score, total_score + score)
+
+            users.append((user_stats, type_counters))
+            if len(attempts) >= BATCH_SIZE:
+                created += flush()
+                attempts = []
+                users = []
+                if progress:
+                    progress(created)
+
+        created += flush()
+
+    with transaction.atomic():
+        rebuild_global_counters()
+        rebuild_problem_statistics()
+        rebuild_daily_statistics()
+
+    return created
+
+
+def seed(problems, sessions, attempts_per_session, days=90, random_seed=None, progress=None):
+    """Задачи и сессии с попытками; возвращает число добавленных (задач, попыток)"""
+    rng = random.Random(random_seed)
+    problems_count = seed_problems(problems, rng) if problems else 0
+    attempts_count = seed_sessions(sessions, attempts_per_session, days, rng, progress) if sessions else 0
+    return problems_count, attempts_count
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Problem, UserStatistics
+from .statistics import invalidate_user_statistics
+from .variants import invalidate_problem_id_index
+
+
+@receiver(post_save, sender=Problem)
+@receiver(post_delete, sender=Problem)
+def reset_problem_id_index(sender, **kwargs):
+    invalidate_problem_id_index()
+
+
+@receiver(post_save, sender=UserStatistics)
+@receiver(post_delete, sender=UserStatistics)
+def reset_user_statistics(sender, instance, created=False, **kwargs):
+    # У только что созданной строки снимка в сессии еще нет
+    if not created:
+        invalidate_user_statistics(instance.session_key)
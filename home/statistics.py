@@ -0,0 +1,758 @@
+import heapq
+from datetime import datetime, time, timedelta
+from itertools import chain
+from importlib import import_module
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import (
+    Count, Sum, Max, Q, F, Case, When, Value, FloatField, IntegerField, OuterRef, Subquery
+)
+from django.db.models.functions import Cast, TruncDate
+from django.utils import timezone
+
+from .models import (
+    Problem, UserStatistics, UserProblemAttempt, AttemptSummary,
+    GlobalTypeCounters, ProblemStatistics, DailyProblemStatistics, DailyUserStatistics
+)
+from .partitions import detach_attempt_partition, drop_attempt_partition
+
+EGE_NUMBERS = range(1, 13)
+
+# Периоды StatisticsFilterForm в днях, включая сегодняшний
+PERIOD_DAYS = {
+    'week': 7,
+    'month': 30,
+    'year': 365,
+}
+
+# Снимок статистики в сессии посетителя. Сессия хранится в базе и общая для
+# всех процессов веб-сервера, а check_variant и так сохраняет ее после записи
+# попыток, поэтому снимок обновляется вместе с ответами без лишних запросов
+USER_STATISTICS_SESSION_KEY = 'user_statistics'
+SNAPSHOT_COUNTERS = ['id', 'total_attempts', 'correct_attempts', 'total_score']
+
+
+def store_user_statistics(session, user_stats):
+    """Положить снимок статистики в сессию; значения приводятся к JSON"""
+    snapshot = {name: getattr(user_stats, name) for name in SNAPSHOT_COUNTERS}
+    snapshot['session_key'] = user_stats.session_key
+    snapshot['created_at'] = user_stats.created_at.isoformat()
+    snapshot['last_activity'] = user_stats.last_activity.isoformat()
+    snapshot['type_statistics'] = [
+        [number, *counters] for number, counters in user_stats.type_statistics_map().items()
+    ]
+    session[USER_STATISTICS_SESSION_KEY] = snapshot
+
+
+def invalidate_user_statistics(session_key):
+    """Удалить снимок из сессии, например после правки статистики в админке"""
+    session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+    if session.pop(USER_STATISTICS_SESSION_KEY, None) is not None:
+        session.save()
+
+
+def get_user_statistics_snapshot(session):
+    """Статистика сессии из снимка в ней, без снимка — из UserStatistics.
+
+    Снимок предназначен только для чтения: сохранять его нельзя,
+    для записи нужен экземпляр из базы. Пока сессия ничего не решала,
+    возвращается несохраненная статистика с нулевыми счетчиками.
+    Чтение сессию не изменяет: снимок пишет только check_variant.
+    """
+    session_key = session.session_key
+    if not session_key:
+        return UserStatistics(session_key='')
+
+    snapshot = session.get(USER_STATISTICS_SESSION_KEY)
+    # После смены ключа сессии снимок относится к чужой строке статистики
+    if snapshot is not None and snapshot['session_key'] == session_key:
+        user_stats = UserStatistics(
+            session_key=session_key,
+            created_at=datetime.fromisoformat(snapshot['created_at']),
+            last_activity=datetime.fromisoformat(snapshot['last_activity']),
+            **{name: snapshot[name] for name in SNAPSHOT_COUNTERS}
+        )
+        user_stats._type_statistics = {
+            number: tuple(counters) for number, *counters in snapshot['type_statistics']
+        }
+        return user_stats
+
+    user_stats = UserStatistics.objects.filter(session_key=session_key).first()
+    if user_stats is None:
+        user_stats = UserStatistics(session_key=session_key)
+    return user_stats
+
+
+def build_type_stats(total, correct, score):
+    """Статистика одного типа задач с точностью и средним баллом"""
+    accuracy = 0
+    if total > 0:
+        accuracy = round((correct / total) * 100, 1)
+
+    average_score = 0
+    if total > 0:
+        average_score = round(score / total, 2)
+
+    return {
+        'total': total,
+        'correct': correct,
+        'score': score,
+        'accuracy': accuracy,
+        'average_score': average_score
+    }
+
+
+def aggregate_attempts_by_type():
+    """Попытки, правильные решения и баллы по номерам ЕГЭ из журнала и свернутых попыток"""
+    return merge_counters(
+        aggregate_attempts('ege_number'),
+        aggregate_summaries('ege_number')
+    )
+
+
+def aggregate_attempts(key):
+    """Счетчики журнала попыток по полю key: {значение: (попытки, правильные, баллы)}"""
+    rows = UserProblemAttempt.objects.order_by().values(key).annotate(
+        total=Count('id'),
+        correct=Count('id', filter=Q(is_correct=True)),
+        total_score=Sum('score')
+    )
+    return {
+        row[key]: (row['total'], row['correct'], row['total_score'] or 0)
+        for row in rows.iterator()
+    }
+
+
+def aggregate_summaries(key):
+    """Счетчики свернутых попыток по полю key"""
+    rows = AttemptSummary.objects.order_by().values(key).annotate(
+        total=Sum('total_attempts'),
+        correct=Sum('correct_attempts'),
+        total_score=Sum('total_score')
+    )
+    return {
+        row[key]: (row['total'] or 0, row['correct'] or 0, row['total_score'] or 0)
+        for row in rows.iterator()
+    }
+
+
+def merge_counters(*sources):
+    merged = {}
+    for counters in sources:
+        for key, (total, correct, score) in counters.items():
+            merged_total, merged_correct, merged_score = merged.get(key, (0, 0, 0))
+            merged[key] = (merged_total + total, merged_correct + correct, merged_score + score)
+    return merged
+
+
+def read_global_counters():
+    """Счетчики по номерам ЕГЭ из таблицы GlobalTypeCounters"""
+    return {
+        row['ege_number']: (
+            row['total_attempts'],
+            row['correct_attempts'],
+            row['total_score']
+        )
+        for row in GlobalTypeCounters.objects.values(
+            'ege_number', 'total_attempts', 'correct_attempts', 'total_score'
+        )
+    }
+
+
+def summarize_attempts(attempts, key):
+    """Дельты счетчиков (попытки, правильные, баллы) по ключу попытки"""
+    deltas = {}
+    for attempt in attempts:
+        total, correct, score = deltas.get(key(attempt), (0, 0, 0))
+        deltas[key(attempt)] = (
+            total + 1,
+            correct + (1 if attempt.is_correct else 0),
+            score + attempt.score
+        )
+    return deltas
+
+
+def delta_case(key_field, deltas, position):
+    """CASE-выражение, выбирающее дельту счетчика для каждой строки"""
+    return Case(
+        *[
+            When(**{key_field: key}, then=Value(delta[position]))
+            for key, delta in deltas.items()
+        ],
+        default=Value(0),
+        output_field=IntegerField()
+    )
+
+
+def counter_changes(key_field, deltas):
+    return {
+        'total_attempts': F('total_attempts') + delta_case(key_field, deltas, 0),
+        'correct_attempts': F('correct_attempts') + delta_case(key_field, deltas, 1),
+        'total_score': F('total_score') + delta_case(key_field, deltas, 2)
+    }
+
+
+def update_global_counters(attempts):
+    """Атомарно прибавить записанные попытки к счетчикам по типам задач.
+
+    Все 12 строк созданы миграцией 0008 и пересчетом, поэтому здесь только UPDATE.
+    """
+    deltas = summarize_attempts(attempts, lambda attempt: attempt.ege_number)
+    if not deltas:
+        return
+
+    GlobalTypeCounters.objects.filter(ege_number__in=deltas).update(
+        updated_at=timezone.now(),
+        **counter_changes('ege_number', deltas)
+    )
+
+
+def rebuild_global_counters():
+    """Пересчитать счетчики по типам задач из журнала попыток"""
+    with transaction.atomic():
+        # Блокируем счетчики, чтобы параллельные записи дождались пересчета
+        list(GlobalTypeCounters.objects.select_for_update())
+        counters = aggregate_attempts_by_type()
+
+        for number in EGE_NUMBERS:
+            total, correct, score = counters.get(number, (0, 0, 0))
+            GlobalTypeCounters.objects.update_or_create(
+                ege_number=number,
+                defaults={
+                    'total_attempts': total,
+                    'correct_attempts': correct,
+                    'total_score': score
+                }
+            )
+
+    return counters
+
+
+def update_problem_statistics(attempts):
+    """Атомарно прибавить записанные попытки к статистике задач"""
+    deltas = summarize_attempts(attempts, lambda attempt: attempt.problem_id)
+    if not deltas:
+        return
+
+    ProblemStatistics.objects.bulk_create(
+        [ProblemStatistics(problem_id=problem_id) for problem_id in deltas],
+        ignore_conflicts=True
+    )
+    ProblemStatistics.objects.filter(problem_id__in=deltas).update(
+        # В UPDATE правая часть видит старые значения счетчиков
+        accuracy=Cast(
+            F('correct_attempts') + delta_case('problem_id', deltas, 1), FloatField()
+        ) * 100 / (F('total_attempts') + delta_case('problem_id', deltas, 0)),
+        **counter_changes('problem_id', deltas)
+    )
+
+
+def update_daily_statistics(user_stats, attempts):
+    """Прибавить записанные попытки к дневной статистике задач и сессии"""
+    if not attempts:
+        return
+    # Попытки одной проверки создаются в один момент, день у них общий
+    date = timezone.localdate(attempts[0].created_at)
+
+    problem_deltas = summarize_attempts(attempts, lambda attempt: attempt.problem_id)
+    ege_numbers = {attempt.problem_id: attempt.ege_number for attempt in attempts}
+    DailyProblemStatistics.objects.bulk_create(
+        [
+            DailyProblemStatistics(date=date, problem_id=problem_id, ege_number=ege_numbers[problem_id])
+            for problem_id in problem_deltas
+        ],
+        ignore_conflicts=True
+    )
+    DailyProblemStatistics.objects.filter(
+        date=date, problem_id__in=problem_deltas
+    ).update(**counter_changes('problem_id', problem_deltas))
+
+    type_deltas = summarize_attempts(attempts, lambda attempt: attempt.ege_number)
+    DailyUserStatistics.objects.bulk_create(
+        [
+            DailyUserStatistics(user_stats=user_stats, date=date, ege_number=number)
+            for number in type_deltas
+        ],
+        ignore_conflicts=True
+    )
+    DailyUserStatistics.objects.filter(
+        user_stats=user_stats, date=date, ege_number__in=type_deltas
+    ).update(**counter_changes('ege_number', type_deltas))
+
+
+def record_attempts(session_key, attempts):
+    """Записать проверенные попытки и обновить статистику в одной транзакции.
+
+    Строка UserStatistics создается только здесь, при первой записанной попытке.
+    session_key уникален: если две первые отправки сессии пришли одновременно,
+    вставка второй упирается в ключ, и get_or_create берет строку первой.
+    """
+    with transaction.atomic():
+        UserProblemAttempt.objects.bulk_create(attempts)
+        user_stats, created = UserStatistics.objects.get_or_create(session_key=session_key)
+        user_stats.record_attempts(attempts)
+        update_problem_statistics(attempts)
+        update_daily_statistics(user_stats, attempts)
+        # 12 строк счетчиков общие для всех отправок: блокируем их последними,
+        # чтобы держать блокировку только до коммита
+        update_global_counters(attempts)
+
+    return user_stats
+
+
+def rebuild_problem_statistics():
+    """Пересчитать статистику задач из журнала попыток"""
+    with transaction.atomic():
+        existing = {
+            problem_stats.problem_id: problem_stats
+            for problem_stats in ProblemStatistics.objects.select_for_update()
+        }
+        counters = merge_counters(aggregate_attempts('problem'), aggregate_summaries('problem'))
+
+        to_create = []
+        for problem_id, (total, correct, score) in counters.items():
+            problem_stats = existing.get(problem_id)
+            if problem_stats is None:
+                problem_stats = ProblemStatistics(problem_id=problem_id)
+                to_create.append(problem_stats)
+            problem_stats.total_attempts = total
+            problem_stats.correct_attempts = correct
+            problem_stats.total_score = score
+            problem_stats.accuracy = correct * 100 / total
+
+        for problem_id, problem_stats in existing.items():
+            if problem_id not in counters:
+                problem_stats.total_attempts = 0
+                problem_stats.correct_attempts = 0
+                problem_stats.total_score = 0
+                problem_stats.accuracy = 0
+
+        ProblemStatistics.objects.bulk_create(to_create, batch_size=1000)
+        ProblemStatistics.objects.bulk_update(
+            list(existing.values()),
+            ['total_attempts', 'correct_attempts', 'total_score', 'accuracy'],
+            batch_size=1000
+        )
+
+    return len(to_create) + len(existing)
+
+
+def rebuild_daily_statistics(since=None):
+    """Пересчитать дневную статистику из журнала попыток, начиная с даты since.
+
+    Дни, попытки которых уже свернуты compact_attempts, не пересчитываются:
+    журнал за них неполон, а дневные строки остаются прежними.
+    Возвращает (строк по задачам, строк по пользователям, фактическая дата
+    начала пересчета или None, если пересчитана вся история).
+    """
+    compacted_until = AttemptSummary.objects.aggregate(
+        compacted_until=Max('compacted_until')
+    )['compacted_until']
+    if compacted_until is not None:
+        first_full_day = timezone.localdate(compacted_until) + timedelta(days=1)
+        since = max(since, first_full_day) if since else first_full_day
+
+    attempts = UserProblemAttempt.objects.order_by()
+    problem_rows = DailyProblemStatistics.objects.all()
+    user_rows = DailyUserStatistics.objects.all()
+    if since is not None:
+        attempts = attempts.filter(created_at__gte=start_of_day(since))
+        problem_rows = problem_rows.filter(date__gte=since)
+        user_rows = user_rows.filter(date__gte=since)
+
+    counters = {
+        'total_attempts': Count('id'),
+        'correct_attempts': Count('id', filter=Q(is_correct=True)),
+        'total_score': Sum('score')
+    }
+
+    with transaction.atomic():
+        problem_rows.delete()
+        user_rows.delete()
+
+        rows = attempts.annotate(date=TruncDate('created_at')).values(
+            'date', 'problem', 'ege_number'
+        ).annotate(**counters)
+        problems_count = bulk_create_batched(DailyProblemStatistics, (
+            DailyProblemStatistics(
+                date=row['date'],
+                problem_id=row['problem'],
+                ege_number=row['ege_number'],
+                total_attempts=row['total_attempts'],
+                correct_attempts=row['correct_attempts'],
+                total_score=row['total_score'] or 0
+            )
+            for row in rows.iterator(chunk_size=5000)
+        ))
+
+        # id строки UserStatistics берется подзапросом по уникальному session_key
+        rows = attempts.annotate(date=TruncDate('created_at')).values(
+            'date', 'session_key', 'ege_number'
+        ).annotate(**counters).annotate(user_stats_id=Subquery(
+            UserStatistics.objects.filter(session_key=OuterRef('session_key')).values('id')
+        ))
+        users_count = bulk_create_batched(DailyUserStatistics, (
+            DailyUserStatistics(
+                user_stats_id=row['user_stats_id'],
+                date=row['date'],
+                ege_number=row['ege_number'],
+                total_attempts=row['total_attempts'],
+                correct_attempts=row['correct_attempts'],
+                total_score=row['total_score'] or 0
+            )
+            for row in rows.iterator(chunk_size=5000)
+            if row['user_stats_id'] is not None
+        ))
+
+    return problems_count, users_count, since
+
+
+def bulk_create_batched(model, objects, batch_size=5000):
+    """bulk_create для генератора без загрузки всех объектов в память"""
+    created = 0
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    model.objects.bulk_create(batch)
+    return created + len(batch)
+
+
+def start_of_day(date):
+    return timezone.make_aware(datetime.combine(date, time.min))
+
+
+def period_start(period):
+    """Первый день периода StatisticsFilterForm, None для всего времени"""
+    days = PERIOD_DAYS.get(period)
+    if days is None:
+        return None
+    return timezone.localdate() - timedelta(days=days - 1)
+
+
+def sum_daily_by_type(queryset):
+    """Суммы дневных строк по номерам ЕГЭ: {номер: (попытки, правильные, баллы)}"""
+    rows = queryset.order_by().values('ege_number').annotate(
+        total=Sum('total_attempts'),
+        correct=Sum('correct_attempts'),
+        score=Sum('total_score')
+    )
+    return {
+        row['ege_number']: (row['total'] or 0, row['correct'] or 0, row['score'] or 0)
+        for row in rows
+    }
+
+
+def compute_global_statistics(period='all'):
+    """Общая статистика платформы: итоги и разбивка по типам задач"""
+    start = period_start(period)
+    if start is None:
+        total_users = UserStatistics.objects.count()
+        counters = read_global_counters()
+    else:
+        total_users = DailyUserStatistics.objects.filter(
+            date__gte=start
+        ).values('user_stats').distinct().count()
+        counters = sum_daily_by_type(DailyProblemStatistics.objects.filter(date__gte=start))
+
+    total_attempts = 0
+    total_correct_attempts = 0
+    total_score = 0
+    problems_by_type = {}
+
+    for number in EGE_NUMBERS:
+        total, correct, score = counters.get(number, (0, 0, 0))
+        total_attempts += total
+        total_correct_attempts += correct
+        total_score += score
+        problems_by_type[str(number)] = build_type_stats(total, correct, score)
+
+    overall_accuracy = 0
+    if total_attempts > 0:
+        overall_accuracy = round((total_correct_attempts / total_attempts) * 100, 1)
+
+    average_score_per_attempt = 0
+    if total_attempts > 0:
+        average_score_per_attempt = round(total_score / total_attempts, 2)
+
+    average_score_per_user = 0
+    if total_users > 0:
+        average_score_per_user = round(total_score / total_users, 1)
+
+    return {
+        'total_users': total_users,
+        'total_attempts': total_attempts,
+        'total_correct_attempts': total_correct_attempts,
+        'total_score': total_score,
+        'overall_accuracy': overall_accuracy,
+        'average_score_per_attempt': average_score_per_attempt,
+        'average_score_per_user': average_score_per_user,
+        'problems_by_type': problems_by_type,
+        'period': period,
+        'updated_at': timezone.now()
+    }
+
+
+def get_global_statistics(request=None, period='all'):
+    """Общая статистика, посчитанная не более одного раза за запрос"""
+    if request is None:
+        return compute_global_statistics(period)
+
+    if not hasattr(request, '_global_statistics'):
+        request._global_statistics = {}
+    global_stats = request._global_statistics.get(period)
+    if global_stats is None:
+        global_stats = compute_global_statistics(period)
+        request._global_statistics[period] = global_stats
+    return global_stats
+
+
+def get_user_period_statistics(user_stats, period):
+    """Статистика сессии за период из дневных строк.
+
+    Возвращает несохраняемую копию UserStatistics со счетчиками периода,
+    для всего времени возвращает саму user_stats.
+    """
+    start = period_start(period)
+    if start is None:
+        return user_stats
+
+    type_statistics = {}
+    if user_stats.pk:
+        type_statistics = sum_daily_by_type(
+            DailyUserStatistics.objects.filter(user_stats_id=user_stats.pk, date__gte=start)
+        )
+
+    period_stats = UserStatistics(
+        id=user_stats.pk,
+        session_key=user_stats.session_key,
+        created_at=user_stats.created_at,
+        last_activity=user_stats.last_activity,
+        total_attempts=sum(counters[0] for counters in type_statistics.values()),
+        correct_attempts=sum(counters[1] for counters in type_statistics.values()),
+        total_score=sum(counters[2] for counters in type_statistics.values())
+    )
+    period_stats._type_statistics = type_statistics
+    period_stats.period = period
+    period_stats.period_start = start_of_day(start)
+    return period_stats
+
+
+def percentage(part, total):
+    return round(part / total * 100, 1) if total > 0 else 0
+
+
+# Окно get_user_weekly_statistics: эта неделя и прошлая для сравнения.
+# compact_attempts не сворачивает попытки моложе него, поэтому журнала
+# попыток для недельной статистики достаточно
+WEEKLY_WINDOW_DAYS = 14
+
+
+def get_user_weekly_statistics(session_key):
+    """Попытки сессии за эту и прошлую неделю одним запросом с условной агрегацией"""
+    week_ago = timezone.now() - timedelta(days=7)
+    two_weeks_ago = timezone.now() - timedelta(days=WEEKLY_WINDOW_DAYS)
+
+    this_week = Q(created_at__gte=week_ago)
+    prev_week = Q(created_at__lt=week_ago)
+    totals = UserProblemAttempt.objects.filter(
+        session_key=session_key,
+        created_at__gte=two_weeks_ago
+    ).aggregate(
+        weekly_total=Count('id', filter=this_week),
+        weekly_correct=Count('id', filter=this_week & Q(is_correct=True)),
+        prev_weekly_total=Count('id', filter=prev_week),
+        prev_weekly_correct=Count('id', filter=prev_week & Q(is_correct=True))
+    )
+
+    weekly_accuracy = percentage(totals['weekly_correct'], totals['weekly_total'])
+    prev_weekly_accuracy = percentage(totals['prev_weekly_correct'], totals['prev_weekly_total'])
+
+    change = 0
+    if prev_weekly_accuracy > 0:
+        change = round(weekly_accuracy - prev_weekly_accuracy, 1)
+
+    return {
+        'total': totals['weekly_total'],
+        'correct': totals['weekly_correct'],
+        'accuracy': weekly_accuracy,
+        'change': change
+    }
+
+
+def get_user_difficult_problems(session_key, limit):
+    """Задачи с наименьшей точностью у сессии, включая свернутые попытки.
+
+    Агрегат журнала и строки AttemptSummary складываются по задачам,
+    затем задачи загружаются одним in_bulk.
+    """
+    recent = UserProblemAttempt.objects.filter(
+        session_key=session_key
+    ).order_by().values('problem').annotate(
+        total=Count('id'),
+        correct=Count('id', filter=Q(is_correct=True))
+    ).values_list('problem', 'total', 'correct')
+    compacted = AttemptSummary.objects.filter(
+        session_key=session_key
+    ).order_by().values_list('problem', 'total_attempts', 'correct_attempts')
+
+    counts = {}
+    for problem_id, total, correct in chain(recent, compacted):
+        previous_total, previous_correct = counts.get(problem_id, (0, 0))
+        counts[problem_id] = (previous_total + total, previous_correct + correct)
+
+    rows = heapq.nsmallest(
+        limit, counts.items(),
+        key=lambda item: (item[1][1] / item[1][0], item[0])
+    )
+    problems = Problem.objects.in_bulk([problem_id for problem_id, totals in rows])
+
+    return [
+        {
+            'problem': problems[problem_id],
+            'total': total,
+            'correct': correct,
+            'accuracy': percentage(correct, total)
+        }
+        for problem_id, (total, correct) in rows
+        if problem_id in problems
+    ]
+
+
+def get_user_compacted_attempts(user_stats, recent_total, recent_correct):
+    """Попытки user_stats, свернутые в AttemptSummary: (всего, правильных).
+
+    За все время это сумма сводок сессии. Сводка не хранит дат попыток,
+    поэтому для периода свернутая часть — разница счетчиков периода из
+    дневных строк и recent_total/recent_correct, несвернутых попыток журнала
+    за тот же период.
+    """
+    if getattr(user_stats, 'period_start', None) is not None:
+        return (
+            max(user_stats.total_attempts - recent_total, 0),
+            max(user_stats.correct_attempts - recent_correct, 0)
+        )
+
+    totals = AttemptSummary.objects.filter(session_key=user_stats.session_key).aggregate(
+        total=Sum('total_attempts'),
+        correct=Sum('correct_attempts')
+    )
+    return totals['total'] or 0, totals['correct'] or 0
+
+
+def merge_attempt_summaries(rows):
+    """Прибавить агрегаты попыток к AttemptSummary.
+
+    rows — словари с session_key, problem, ege_number, total, correct,
+    total_score и last_created_at, не больше одного на пару (сессия, задача).
+    Вызывается внутри транзакции, которая удаляет свернутые попытки.
+    """
+    rows = {(row['session_key'], row['problem']): row for row in rows}
+    summaries = {
+        (summary.session_key, summary.problem_id): summary
+        for summary in AttemptSummary.objects.select_for_update().filter(
+            session_key__in={session_key for session_key, problem_id in rows},
+            problem_id__in={problem_id for session_key, problem_id in rows}
+        )
+    }
+
+    to_create = []
+    to_update = []
+    for key, row in rows.items():
+        summary = summaries.get(key)
+        if summary is None:
+            summary = AttemptSummary(
+                session_key=row['session_key'],
+                problem_id=row['problem'],
+                ege_number=row['ege_number'],
+                compacted_until=row['last_created_at']
+            )
+            to_create.append(summary)
+        else:
+            to_update.append(summary)
+        summary.total_attempts += row['total']
+        summary.correct_attempts += row['correct']
+        summary.total_score += row['total_score'] or 0
+        summary.compacted_until = max(summary.compacted_until, row['last_created_at'])
+
+    AttemptSummary.objects.bulk_create(to_create, batch_size=1000)
+    AttemptSummary.objects.bulk_update(
+        to_update,
+        ['total_attempts', 'correct_attempts', 'total_score', 'compacted_until'],
+        batch_size=1000
+    )
+
+
+def compact_attempts_batch(horizon, batch_size):
+    """Свернуть до batch_size самых старых попыток раньше horizon в AttemptSummary.
+
+    Счетчики и удаление сырых строк делаются в одной транзакции, поэтому
+    повторный или прерванный запуск не учитывает попытки дважды.
+    Возвращает число свернутых попыток.
+    """
+    with transaction.atomic():
+        attempt_ids = list(
+            UserProblemAttempt.objects.filter(created_at__lt=horizon)
+            .order_by('created_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not attempt_ids:
+            return 0
+
+        merge_attempt_summaries(
+            UserProblemAttempt.objects.filter(id__in=attempt_ids).order_by().values(
+                'session_key', 'problem', 'ege_number'
+            ).annotate(
+                total=Count('id'),
+                correct=Count('id', filter=Q(is_correct=True)),
+                total_score=Sum('score'),
+                last_created_at=Max('created_at')
+            )
+        )
+        UserProblemAttempt.objects.filter(id__in=attempt_ids).delete()
+
+    return len(attempt_ids)
+
+
+def compact_attempt_partition(name, batch_size):
+    """Свернуть месячную партицию попыток целиком и удалить ее (PostgreSQL).
+
+    Агрегаты читаются из самой партиции серверным курсором пачками по
+    batch_size групп, затем партиция отсоединяется и удаляется: вместо
+    DELETE по строкам — изменение метаданных. Все в одной транзакции,
+    поэтому прерванный запуск ничего не меняет. Возвращает число попыток.
+    """
+    quoted_name = connection.ops.quote_name(name)
+    compacted = 0
+
+    with transaction.atomic():
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(
+                f"SELECT session_key, problem_id, ege_number, COUNT(*), "
+                f"COUNT(*) FILTER (WHERE is_correct), SUM(score), MAX(created_at) "
+                f"FROM {quoted_name} GROUP BY session_key, problem_id, ege_number"
+            )
+            while chunk := cursor.fetchmany(batch_size):
+                merge_attempt_summaries(
+                    {
+                        'session_key': session_key,
+                        'problem': problem_id,
+                        'ege_number': ege_number,
+                        'total': total,
+                        'correct': correct,
+                        'total_score': total_score,
+                        'last_created_at': last_created_at,
+                    }
+                    for session_key, problem_id, ege_number, total, correct, total_score, last_created_at
+                    in chunk
+                )
+                compacted += sum(row[3] for row in chunk)
+
+        detach_attempt_partition(name)
+        drop_attempt_partition(name)
+
+    return compacted
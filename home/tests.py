@@ -1,3 +1,937 @@
-from django.test import TestCase
+import io
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from .models import Problem
+
+
+@override_settings(
+    REQUEST_INSTRUMENTATION=True,
+    QUERY_BUDGET_STRICT=True,
+    CHART_RENDER_WORKERS=0,
+    ALLOWED_HOSTS=['testserver'],
+)
+class QueryBudgetTests(TestCase):
+    """Страницы укладываются в бюджет запросов QUERY_BUDGETS"""
+
+    @classmethod
+    def setUpTestData(cls):
+        Problem.objects.bulk_create([
+            Problem(ege_number=number, text=f'Задача {number}.{i}', answer=number)
+            for number in range(1, 13)
+            for i in range(3)
+        ])
+
+    def setUp(self):
+        from .variants import invalidate_problem_id_index
+
+        # Новая версия индекса задач: первый запрос перестроит его сам
+        invalidate_problem_id_index()
+        caches['charts'].clear()
+
+    def solve_variant(self):
+        self.client.get(reverse('full_variant'))
+        problem_ids = self.client.session['current_variant_ids']
+        answers = {
+            f'answer_{problem.id}': problem.answer if problem.ege_number % 2 else '0'
+            for problem in Problem.objects.filter(id__in=problem_ids)
+        }
+        return self.client.post(reverse('check_variant'), answers)
+
+    def test_pages_for_new_visitor(self):
+        for name in ['index', 'choose_mode', 'full_variant', 'all_numbers',
+                     'user_statistics', 'global_statistics']:
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name))
+                self.assertEqual(response.status_code, 200)
+
+    def test_pages_after_variant(self):
+        self.assertEqual(self.solve_variant().status_code, 302)
+        self.assertEqual(self.solve_variant().status_code, 302)
+
+        for url in [
+            reverse('show_result'),
+            reverse('all_numbers'),
+            reverse('problems_by_number', args=[3]),
+            reverse('user_statistics'),
+            reverse('global_statistics'),
+            reverse('user_statistics') + '?period=week',
+            reverse('global_statistics') + '?period=month&problem_type=3',
+            reverse('search_problems') + '?search=Задача&problem_type=3',
+        ]:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_charts(self):
+        self.solve_variant()
+
+        for kind in ['global-accuracy', 'user-accuracy', 'progress']:
+            for name in ['chart_image', 'chart_data']:
+                with self.subTest(kind=kind, name=name):
+                    response = self.client.get(reverse(name, args=[kind]))
+                    self.assertEqual(response.status_code, 200)
+
+    def test_pending_chart_placeholder(self):
+        from unittest import mock
+
+        self.solve_variant()
+        with mock.patch('home.charts.get_chart_png', return_value=None):
+            response = self.client.get(reverse('chart_image', args=['global-accuracy']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertIn('no-store', response['Cache-Control'])
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_chart_not_modified(self):
+        self.solve_variant()
+        url = reverse('chart_image', args=['user-accuracy'])
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+        # Новая попытка меняет версию данных, а с ней и ETag
+        self.solve_variant()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_versioned_chart_url_is_immutable(self):
+        self.solve_variant()
+        url = reverse('chart_image', args=['global-accuracy'])
+        etag = self.client.get(url)['ETag'].strip('"')
+
+        response = self.client.get(url, {'v': etag})
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('public', response['Cache-Control'])
+
+    def test_client_chart_data(self):
+        self.solve_variant()
+        response = self.client.get(reverse('chart_data', args=['user-accuracy']))
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+        data = response.json()
+        self.assertEqual(data['kind'], 'user-accuracy')
+        self.assertEqual(data['labels'], list(range(1, 13)))
+        self.assertEqual(set(data['series']), {'accuracies', 'average_accuracy'})
+        self.assertEqual(len(data['series']['accuracies']), 12)
+        # Нечетные номера решены верно, четные — нет
+        self.assertEqual(data['series']['accuracies'][:2], [100.0, 0.0])
+        self.assertEqual(data['series']['average_accuracy'], 50.0)
+
+    def test_client_chart_mode(self):
+        self.solve_variant()
+        response = self.client.get(reverse('user_statistics'), {'charts': 'client'})
+        self.assertContains(response, 'data-chart-src="/charts/user-accuracy.json?v=')
+        self.assertContains(response, 'js/charts.js')
+
+        response = self.client.get(reverse('user_statistics'), {'charts': 'unknown'})
+        self.assertNotContains(response, 'data-chart-src')
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('index'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+
+    @override_settings(QUERY_BUDGETS={'index': 0})
+    def test_budget_exceeded(self):
+        from .instrumentation import QueryBudgetExceeded
+
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('index'))
+
+
+class ChartRenderTests(TestCase):
+    """Отрисовка графиков в пуле и кэш готовых PNG"""
+
+    def tearDown(self):
+        caches['charts'].clear()
+
+    def test_duplicate_renders_share_one_job(self):
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+        from unittest import mock
+        from . import charts
+
+        calls = []
+        release = threading.Event()
+
+        def render(value):
+            calls.append(value)
+            release.wait(5)
+            return b'png'
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        with mock.patch.object(charts, 'get_render_executor', return_value=executor), \
+                override_settings(CHART_RENDER_TIMEOUT=0.05):
+            self.assertIsNone(charts.render_chart('chart:test:1', render, 1))
+            self.assertIsNone(charts.render_chart('chart:test:1', render, 1))
+            release.set()
+            executor.shutdown(wait=True)
+
+        self.assertEqual(calls, [1])
+        self.assertEqual(caches['charts'].get('chart:test:1'), b'png')
+        self.assertNotIn('chart:test:1', charts._in_flight)
+
+    @override_settings(CHART_RENDER_WORKERS=0)
+    def test_cache_keyed_by_data_version(self):
+        from . import charts
+
+        prepared = []
+
+        def source(value):
+            def prepare():
+                prepared.append(value)
+                return (lambda number: f'png{number}'.encode()), (value,)
+            return prepare
+
+        self.assertEqual(charts.get_chart_png('test', 'v1', source(1)), b'png1')
+        self.assertEqual(charts.get_chart_png('test', 'v1', source(2)), b'png1')
+        self.assertEqual(charts.get_chart_png('test', 'v2', source(3)), b'png3')
+        self.assertEqual(prepared, [1, 3])
+
+    def test_lttb_downsampling(self):
+        import numpy as np
+        from . import charts
+
+        x = np.arange(1, 10001)
+        y = np.sin(x / 300) * 50 + 50
+        sampled_x, sampled_y = charts.downsample_lttb(x, y, 500)
+
+        self.assertEqual(len(sampled_x), 500)
+        self.assertEqual(len(sampled_y), 500)
+        self.assertEqual((sampled_x[0], sampled_x[-1]), (1, 10000))
+        self.assertEqual((sampled_y[0], sampled_y[-1]), (y[0], y[-1]))
+        self.assertTrue(np.all(np.diff(sampled_x) > 0))
+        # Точки берутся из исходного ряда, а не интерполируются
+        np.testing.assert_array_equal(sampled_y, y[sampled_x - 1])
+
+    def test_lttb_short_series_unchanged(self):
+        import numpy as np
+        from . import charts
+
+        x = np.arange(1, 101)
+        y = x * 2.0
+        sampled_x, sampled_y = charts.downsample_lttb(x, y, 500)
+        np.testing.assert_array_equal(sampled_x, x)
+        np.testing.assert_array_equal(sampled_y, y)
+
+    def test_cumulative_accuracy_after_compaction(self):
+        from . import charts
+
+        attempt_numbers, accuracy = charts.cumulative_accuracy_series([True, False], (4, 2))
+        self.assertEqual(attempt_numbers.tolist(), [4, 5, 6])
+        self.assertEqual(accuracy.tolist(), [50.0, 60.0, 50.0])
+
+    def test_data_version_changes_with_attempts(self):
+        from .models import UserProblemAttempt
+        from .statistics import compute_global_statistics, record_attempts
+        from .views import global_data_version, user_data_version
+
+        problem = Problem.objects.create(ege_number=1, text='Задача', answer=1)
+
+        def solve():
+            return record_attempts('alpha', [UserProblemAttempt(
+                session_key='alpha', problem=problem, ege_number=1,
+                user_answer=1, is_correct=True, score=1
+            )])
+
+        user_version = user_data_version(solve())
+        global_version = global_data_version(compute_global_statistics())
+        self.assertEqual(global_data_version(compute_global_statistics()), global_version)
+
+        self.assertNotEqual(user_data_version(solve()), user_version)
+        self.assertNotEqual(global_data_version(compute_global_statistics()), global_version)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class AttemptExportTests(TestCase):
+    """Выгрузка журнала попыток доступна только персоналу"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth.models import User
+        from .models import UserProblemAttempt
+
+        cls.staff = User.objects.create_user('staff', password='password', is_staff=True)
+        problem = Problem.objects.create(ege_number=5, text='Задача', answer=7)
+        UserProblemAttempt.objects.bulk_create([
+            UserProblemAttempt(
+                session_key=f'session{i}', problem=problem, ege_number=5,
+                user_answer=7 if i % 2 else 1, is_correct=bool(i % 2), score=i % 2
+            )
+            for i in range(3)
+        ])
+
+    def test_requires_staff(self):
+        response = self.client.get(reverse('export_attempts'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_csv(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('export_attempts'))
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[4], 'ege_number')
+        self.assertEqual(len(lines), 4)
+
+    def test_date_range(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('export_attempts'), {'date_to': '2000-01-01'})
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 1)
+
+        response = self.client.get(reverse('export_attempts'), {'date_from': 'вчера'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_parquet(self):
+        import os
+        import tempfile
+        from .exports import parquet_available
+
+        if not parquet_available():
+            self.skipTest('pyarrow не установлен')
+        import pyarrow.parquet as pq
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'attempts.parquet')
+            call_command('export_attempts', path, chunk_size=2, stdout=io.StringIO())
+            table = pq.read_table(path)
+
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(table.column('ege_number').to_pylist(), [5, 5, 5])
+        self.assertEqual(table.column('is_correct').to_pylist().count(True), 1)
+
+    def test_parquet_without_pyarrow(self):
+        import sys
+        from unittest import mock
+        from django.core.management.base import CommandError
+        from .exports import export_formats
+
+        with mock.patch.dict(sys.modules, {'pyarrow': None, 'pyarrow.parquet': None}):
+            self.assertEqual(export_formats(), ('csv',))
+            with self.assertRaises(CommandError):
+                call_command('export_attempts', 'attempts.csv', '--format', 'parquet')
+            with self.assertRaisesMessage(CommandError, 'pyarrow'):
+                call_command('export_attempts', 'attempts.parquet', stdout=io.StringIO())
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ProblemSearchTests(TestCase):
+    """Поиск задач по условию и номеру"""
+
+    @classmethod
+    def setUpTestData(cls):
+        Problem.objects.bulk_create([
+            Problem(ege_number=3, text='Найдите площадь треугольника', answer=1),
+            Problem(ege_number=4, text='Найдите вероятность события', answer=0.5),
+            Problem(ege_number=3, text='Найдите объем куба', answer=8),
+        ])
+
+    def search(self, **params):
+        response = self.client.get(reverse('search_problems'), params)
+        self.assertEqual(response.status_code, 200)
+        return [problem.text for problem in response.context['problems']]
+
+    def test_search_text(self):
+        self.assertEqual(self.search(search='треугольника'), ['Найдите площадь треугольника'])
+
+    def test_search_with_type(self):
+        self.assertEqual(
+            self.search(search='Найдите', problem_type='3'),
+            ['Найдите площадь треугольника', 'Найдите объем куба']
+        )
+
+    def test_empty_query(self):
+        self.assertEqual(self.search(), [])
+
+    def test_update_and_import_are_searchable(self):
+        from .importing import import_problems
+
+        Problem.objects.filter(text='Найдите объем куба').update(text='Найдите объем шара')
+        list(import_problems(io.StringIO('text,answer,ege_number\nНайдите радиус шара,2,3\n'), 'csv', 10, []))
+
+        self.assertEqual(
+            self.search(search='шара'), ['Найдите объем шара', 'Найдите радиус шара']
+        )
+        self.assertEqual(self.search(search='куба'), [])
+
+
+class UserStatisticsSessionTests(TestCase):
+    """Одна строка UserStatistics на сессию"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.problem = Problem.objects.create(ege_number=2, text='Задача', answer=4)
+
+    def attempt(self, session_key, is_correct=True):
+        from .models import UserProblemAttempt
+
+        return UserProblemAttempt(
+            session_key=session_key, problem=self.problem, ege_number=2,
+            user_answer=4 if is_correct else 0, is_correct=is_correct, score=int(is_correct)
+        )
+
+    def test_session_key_unique(self):
+        from django.db import IntegrityError
+        from .models import UserStatistics
+
+        UserStatistics.objects.create(session_key='session')
+        with self.assertRaises(IntegrityError):
+            UserStatistics.objects.create(session_key='session')
+
+    def test_record_reuses_row(self):
+        from .models import UserStatistics
+        from .statistics import record_attempts
+
+        record_attempts('session', [self.attempt('session')])
+        record_attempts('session', [self.attempt('session', is_correct=False)])
+
+        user_stats = UserStatistics.objects.get(session_key='session')
+        self.assertEqual((user_stats.total_attempts, user_stats.correct_attempts), (2, 1))
+
+
+class UserStatisticsCountersTests(TestCase):
+    """Счетчики UserStatistics прибавляются в базе, а не перезаписываются из Python"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.problems = Problem.objects.bulk_create([
+            Problem(ege_number=2, text='Задача 2', answer=4),
+            Problem(ege_number=7, text='Задача 7', answer=1),
+        ])
+
+    def test_stale_instances_do_not_lose_updates(self):
+        from .models import UserStatistics
+
+        UserStatistics.objects.create(session_key='session')
+        first = UserStatistics.objects.get(session_key='session')
+        second = UserStatistics.objects.get(session_key='session')
+
+        first.update_statistics(self.problems[0], True, score=2)
+        second.update_statistics(self.problems[1], False)
+        first.update_statistics(self.problems[1], True)
+
+        user_stats = UserStatistics.objects.get(session_key='session')
+        self.assertEqual(
+            (user_stats.total_attempts, user_stats.correct_attempts, user_stats.total_score),
+            (3, 2, 3)
+        )
+        self.assertEqual(user_stats.type_statistics_map(), {2: (1, 1, 2), 7: (2, 1, 1)})
+        # Экземпляр видит итог после своего UPDATE, включая чужие прибавки
+        self.assertEqual(first.total_attempts, 3)
+
+    def test_counters_updated_with_f_expressions(self):
+        from django.test.utils import CaptureQueriesContext
+        from .models import UserStatistics
+
+        user_stats = UserStatistics.objects.create(session_key='session')
+        with CaptureQueriesContext(connection) as queries:
+            user_stats.update_statistics(self.problems[0], True)
+
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertTrue(updates)
+        for sql in updates:
+            self.assertIn('."total_attempts" + ', sql)
+
+
+class MergeDuplicateSessionsMigrationTests(TransactionTestCase):
+    """Миграция 0016 сливает дубли UserStatistics перед уникальным ключом"""
+
+    before = [('home', '0015_problem_search_vector')]
+    after = [('home', '0016_unique_user_statistics_session')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        call_command('migrate', verbosity=0)
+
+    def test_merge(self):
+        apps = self.migrate(self.before)
+        UserStatistics = apps.get_model('home', 'UserStatistics')
+        UserTypeStatistics = apps.get_model('home', 'UserTypeStatistics')
+
+        first = UserStatistics.objects.create(session_key='session', total_attempts=2, correct_attempts=1)
+        second = UserStatistics.objects.create(session_key='session', total_attempts=3, correct_attempts=3)
+        UserTypeStatistics.objects.create(user_stats=first, ege_number=2, total_attempts=2, correct_attempts=1)
+        UserTypeStatistics.objects.create(user_stats=second, ege_number=2, total_attempts=1, correct_attempts=1)
+        UserTypeStatistics.objects.create(user_stats=second, ege_number=5, total_attempts=2, correct_attempts=2)
+
+        apps = self.migrate(self.after)
+        UserStatistics = apps.get_model('home', 'UserStatistics')
+        UserTypeStatistics = apps.get_model('home', 'UserTypeStatistics')
+
+        user_stats = UserStatistics.objects.get(session_key='session')
+        self.assertEqual(user_stats.id, first.id)
+        self.assertEqual((user_stats.total_attempts, user_stats.correct_attempts), (5, 4))
+        self.assertEqual(
+            sorted(UserTypeStatistics.objects.values_list('user_stats_id', 'ege_number', 'total_attempts')),
+            [(first.id, 2, 3), (first.id, 5, 2)]
+        )
+
+
+@override_settings(CHART_RENDER_WORKERS=0, ALLOWED_HOSTS=['testserver'])
+class UserStatisticsSnapshotTests(TestCase):
+    """Снимок статистики живет в сессии и обновляется при проверке варианта"""
+
+    @classmethod
+    def setUpTestData(cls):
+        Problem.objects.bulk_create([
+            Problem(ege_number=number, text=f'Задача {number}', answer=number)
+            for number in range(1, 13)
+        ])
+
+    def solve_variant(self):
+        self.client.get(reverse('full_variant'))
+        answers = {
+            f'answer_{problem.id}': problem.answer
+            for problem in Problem.objects.filter(id__in=self.client.session['current_variant_ids'])
+        }
+        self.client.post(reverse('check_variant'), answers)
+
+    def test_snapshot_follows_submissions(self):
+        from .statistics import USER_STATISTICS_SESSION_KEY
+
+        self.solve_variant()
+        self.assertEqual(self.client.session[USER_STATISTICS_SESSION_KEY]['total_attempts'], 12)
+        self.solve_variant()
+        self.assertEqual(self.client.session[USER_STATISTICS_SESSION_KEY]['total_attempts'], 24)
+
+        response = self.client.get(reverse('user_statistics'))
+        self.assertEqual(response.context['user_stats'].total_attempts, 24)
+        self.assertEqual(response.context['user_stats'].get_type_statistics(3)['total'], 2)
+
+    def test_admin_edit_drops_snapshot(self):
+        from .models import UserStatistics
+        from .statistics import USER_STATISTICS_SESSION_KEY
+
+        self.solve_variant()
+        user_stats = UserStatistics.objects.get(session_key=self.client.session.session_key)
+        user_stats.total_attempts = 100
+        user_stats.save()
+
+        self.assertNotIn(USER_STATISTICS_SESSION_KEY, self.client.session)
+        response = self.client.get(reverse('user_statistics'))
+        self.assertEqual(response.context['user_stats'].total_attempts, 100)
+
+
+class EgeNumberChangeTests(TestCase):
+    """Номер задачи с попытками не меняется ни в админке, ни импортом"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from .statistics import record_attempts
+        from .models import UserProblemAttempt
+
+        cls.solved = Problem.objects.create(ege_number=2, text='Решенная задача', answer=4)
+        cls.fresh = Problem.objects.create(ege_number=2, text='Новая задача', answer=5)
+        record_attempts('session', [UserProblemAttempt(
+            session_key='session', problem=cls.solved, ege_number=2,
+            user_answer=4, is_correct=True, score=1
+        )])
+
+    def test_save_refuses_change(self):
+        from django.core.exceptions import ValidationError
+
+        self.solved.ege_number = 3
+        with self.assertRaises(ValidationError):
+            self.solved.save()
+
+        self.solved.ege_number = 2
+        self.solved.text = 'Исправленное условие'
+        self.solved.save()
+
+        self.fresh.ege_number = 3
+        self.fresh.save()
+
+    def test_import_skips_change(self):
+        import io
+        from .importing import import_problems
+
+        errors = []
+        stream = io.StringIO(
+            'id,text,answer,ege_number\n'
+            f'{self.solved.id},Решенная задача,4,3\n'
+            f'{self.fresh.id},Новая задача,5,3\n'
+        )
+        self.assertEqual(list(import_problems(stream, 'csv', 100, errors)), [(1, 0)])
+        self.assertEqual([line_number for line_number, message in errors], [2])
+        self.assertEqual(Problem.objects.get(id=self.solved.id).ege_number, 2)
+        self.assertEqual(Problem.objects.get(id=self.fresh.id).ege_number, 3)
+
+
+class AttemptHistoryMixin:
+    """Попытки нескольких сессий за разные дни и снимок всей производной статистики"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.problems = Problem.objects.bulk_create([
+            Problem(ege_number=number, text=f'Задача {number}.{i}', answer=number)
+            for number in (1, 2, 5)
+            for i in range(2)
+        ])
+
+    def record(self, session_key, days_ago, outcomes):
+        """Записать вариант: outcomes — [(задача, правильно ли)]"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import UserProblemAttempt
+        from .seeding import explicit_created_at
+        from .statistics import record_attempts
+
+        created_at = timezone.now() - timedelta(days=days_ago)
+        with explicit_created_at():
+            record_attempts(session_key, [
+                UserProblemAttempt(
+                    session_key=session_key, problem=problem, ege_number=problem.ege_number,
+                    user_answer=problem.answer if is_correct else 0,
+                    is_correct=is_correct, score=int(is_correct), created_at=created_at
+                )
+                for problem, is_correct in outcomes
+            ])
+
+    def record_history(self):
+        first, second, third, fourth, fifth, sixth = self.problems
+        self.record('alpha', 200, [(first, True), (third, False), (fifth, True)])
+        self.record('alpha', 190, [(first, False), (third, True)])
+        self.record('beta', 185, [(second, True), (fifth, False), (sixth, True)])
+        self.record('alpha', 3, [(first, True), (fourth, True)])
+        self.record('beta', 1, [(second, False), (sixth, True)])
+        self.record('gamma', 0, [(third, True), (fifth, True), (sixth, False)])
+
+    def statistics_state(self):
+        from .models import (
+            GlobalTypeCounters, ProblemStatistics, DailyProblemStatistics,
+            DailyUserStatistics, UserStatistics, UserTypeStatistics
+        )
+
+        counters = ['total_attempts', 'correct_attempts', 'total_score']
+        return {
+            'global': sorted(GlobalTypeCounters.objects.values_list('ege_number', *counters)),
+            'problems': sorted(
+                (problem_id, total, correct, score, round(accuracy, 6))
+                for problem_id, total, correct, score, accuracy
+                in ProblemStatistics.objects.values_list('problem_id', *counters, 'accuracy')
+            ),
+            'daily_problems': sorted(DailyProblemStatistics.objects.values_list(
+                'date', 'problem_id', 'ege_number', *counters
+            )),
+            'daily_users': sorted(DailyUserStatistics.objects.values_list(
+                'user_stats__session_key', 'date', 'ege_number', *counters
+            )),
+            'users': sorted(UserStatistics.objects.values_list('session_key', *counters)),
+            'user_types': sorted(UserTypeStatistics.objects.values_list(
+                'user_stats__session_key', 'ege_number', *counters
+            )),
+            'solved': {
+                user_stats.session_key: user_stats.solved_problems
+                for user_stats in UserStatistics.objects.all()
+            },
+        }
+
+
+class CompactionTests(AttemptHistoryMixin, TestCase):
+    """Свертка старых попыток не меняет статистику и безопасна при повторе"""
+
+    def compact(self):
+        call_command('compact_attempts', days=180, batch_size=2, stdout=io.StringIO())
+
+    def test_compaction_keeps_statistics(self):
+        from .models import AttemptSummary, UserProblemAttempt
+
+        self.record_history()
+        before = self.statistics_state()
+
+        self.compact()
+        self.assertEqual(UserProblemAttempt.objects.count(), 7)
+        self.assertEqual(
+            sum(AttemptSummary.objects.values_list('total_attempts', flat=True)), 8
+        )
+        self.assertEqual(self.statistics_state(), before)
+
+    def test_compaction_twice(self):
+        from .models import AttemptSummary
+
+        self.record_history()
+        before = self.statistics_state()
+        self.compact()
+        summaries = sorted(AttemptSummary.objects.values_list(
+            'session_key', 'problem_id', 'total_attempts', 'correct_attempts', 'total_score'
+        ))
+
+        self.compact()
+        self.assertEqual(sorted(AttemptSummary.objects.values_list(
+            'session_key', 'problem_id', 'total_attempts', 'correct_attempts', 'total_score'
+        )), summaries)
+        self.assertEqual(self.statistics_state(), before)
+
+    def user_outputs(self, session_key):
+        """Недельная статистика, трудные задачи и последняя точка графика прогресса"""
+        from .models import UserStatistics
+        from .statistics import (
+            get_user_difficult_problems, get_user_period_statistics, get_user_weekly_statistics
+        )
+        from .views import progress_chart_source
+
+        user_stats = UserStatistics.objects.get(session_key=session_key)
+        progress = {}
+        for period in ('all', 'year', 'week'):
+            source = progress_chart_source(get_user_period_statistics(user_stats, period))
+            render, (attempt_numbers, cumulative_accuracy, accuracy) = source[1]()
+            progress[period] = (attempt_numbers[-1], round(cumulative_accuracy[-1], 6), accuracy)
+
+        return {
+            'weekly': get_user_weekly_statistics(session_key),
+            'difficult': [
+                (row['problem'].pk, row['total'], row['correct'], row['accuracy'])
+                for row in get_user_difficult_problems(session_key, 5)
+            ],
+            'progress': progress,
+        }
+
+    def test_compaction_keeps_user_outputs(self):
+        self.record_history()
+        before = {session_key: self.user_outputs(session_key) for session_key in ('alpha', 'beta')}
+
+        self.compact()
+        for session_key, outputs in before.items():
+            self.assertEqual(self.user_outputs(session_key), outputs)
+
+    def test_horizon_shorter_than_weekly_window(self):
+        from django.core.management.base import CommandError
+
+        with self.assertRaises(CommandError):
+            call_command('compact_attempts', days=7, stdout=io.StringIO())
+
+    def test_rebuild_after_compaction(self):
+        self.record_history()
+        before = self.statistics_state()
+        self.compact()
+
+        call_command('rebuild_statistics', stdout=io.StringIO())
+        output = io.StringIO()
+        call_command('backfill_daily_statistics', stdout=output)
+        self.assertNotIn('за всю историю', output.getvalue())
+        self.assertIn('более ранние дни свернуты', output.getvalue())
+        self.assertEqual(self.statistics_state(), before)
+
+
+class IncrementalStatisticsTests(AttemptHistoryMixin, TestCase):
+    """Счетчики, которые обновляет record_attempts, совпадают с полным пересчетом"""
+
+    def test_record_matches_rebuild(self):
+        from .models import GlobalTypeCounters, ProblemStatistics, DailyProblemStatistics
+
+        self.record_history()
+        recorded = self.statistics_state()
+        self.assertEqual(
+            sum(GlobalTypeCounters.objects.values_list('total_attempts', flat=True)), 15
+        )
+
+        ProblemStatistics.objects.update(total_attempts=0, correct_attempts=0, total_score=0, accuracy=0)
+        GlobalTypeCounters.objects.all().delete()
+        DailyProblemStatistics.objects.all().delete()
+        call_command('rebuild_statistics', stdout=io.StringIO())
+        call_command('backfill_daily_statistics', stdout=io.StringIO())
+        self.assertEqual(self.statistics_state(), recorded)
+
+    def test_period_rebuild_keeps_older_days(self):
+        self.record_history()
+        recorded = self.statistics_state()
+
+        call_command('backfill_daily_statistics', days=7, stdout=io.StringIO())
+        self.assertEqual(self.statistics_state(), recorded)
+
+
+class GlobalStatisticsTests(AttemptHistoryMixin, TestCase):
+    """Общая статистика платформы из сгруппированных счетчиков по номерам"""
+
+    def test_attempts_grouped_in_one_query(self):
+        from .statistics import aggregate_attempts
+
+        self.record_history()
+        with self.assertNumQueries(1):
+            counters = aggregate_attempts('ege_number')
+        self.assertEqual(counters, {1: (5, 3, 3), 2: (4, 3, 3), 5: (6, 4, 4)})
+
+    def test_global_statistics(self):
+        from .statistics import compute_global_statistics
+
+        self.record_history()
+        with self.assertNumQueries(2):
+            global_stats = compute_global_statistics()
+        self.assertEqual(global_stats['total_users'], 3)
+        self.assertEqual(global_stats['total_attempts'], 15)
+        self.assertEqual(global_stats['total_correct_attempts'], 10)
+        self.assertEqual(global_stats['overall_accuracy'], 66.7)
+        self.assertEqual(global_stats['problems_by_type']['1']['accuracy'], 60.0)
+        self.assertEqual(global_stats['problems_by_type']['3']['total'], 0)
+
+        week_stats = compute_global_statistics('week')
+        self.assertEqual(week_stats['total_users'], 3)
+        self.assertEqual(week_stats['total_attempts'], 7)
+        self.assertEqual(week_stats['total_correct_attempts'], 5)
+
+
+class UserStatisticsQueriesTests(AttemptHistoryMixin, TestCase):
+    """Недельное сравнение и трудные задачи сессии без запросов на каждую задачу"""
+
+    def setUp(self):
+        first, second = self.problems[:2]
+        self.record_history()
+        self.record('alpha', 10, [(first, True), (second, False)])
+
+    def test_weekly_statistics_in_one_query(self):
+        from .statistics import get_user_weekly_statistics
+
+        with self.assertNumQueries(1):
+            weekly = get_user_weekly_statistics('alpha')
+        self.assertEqual(weekly, {'total': 2, 'correct': 2, 'accuracy': 100.0, 'change': 50.0})
+
+    def test_difficult_problems(self):
+        from .statistics import get_user_difficult_problems
+
+        first, second, third = self.problems[:3]
+        # Журнал, свернутые попытки и задачи — по одному запросу
+        with self.assertNumQueries(3):
+            difficult = get_user_difficult_problems('alpha', 3)
+        self.assertEqual(
+            [(row['problem'], row['total'], row['correct'], row['accuracy']) for row in difficult],
+            [(second, 1, 0, 0), (third, 2, 1, 50.0), (first, 4, 3, 75.0)]
+        )
+
+
+class ImportProblemsTests(TestCase):
+    """Потоковый импорт задач из CSV и JSONL"""
+
+    def run_import(self, content, file_format='csv', batch_size=100):
+        from .importing import import_problems
+
+        errors = []
+        batches = list(import_problems(io.StringIO(content), file_format, batch_size, errors))
+        return batches, errors
+
+    def test_csv_validation(self):
+        batches, errors = self.run_import(
+            'text,answer,ege_number\n'
+            'Найдите x,"2,5",4\n'
+            ',1,4\n'
+            'Без номера,1,\n'
+            'Номер вне диапазона,1,13\n'
+            'Не число,abc,4\n'
+            'Бесконечность,inf,4\n'
+        )
+        self.assertEqual(batches, [(0, 1)])
+        self.assertEqual([line_number for line_number, message in errors], [3, 4, 5, 6, 7])
+        self.assertEqual(Problem.objects.get().answer, 2.5)
+
+    def test_jsonl_validation(self):
+        batches, errors = self.run_import(
+            '{"text": "Задача", "answer": 3, "ege_number": 1}\n'
+            '\n'
+            '{"text": "Оборванная строка"\n'
+            '[1, 2]\n',
+            file_format='jsonl'
+        )
+        self.assertEqual(batches, [(0, 1)])
+        self.assertEqual([line_number for line_number, message in errors], [3, 4])
+
+    def test_upsert_by_id(self):
+        existing = Problem.objects.create(ege_number=1, text='Старое условие', answer=1)
+
+        batches, errors = self.run_import(
+            'id,text,answer,ege_number\n'
+            f'{existing.id},Промежуточное условие,2,1\n'
+            f'{existing.id},Новое условие,3,2\n'
+            '500,Задача с явным id,4,3\n'
+            ',Задача без id,5,4\n',
+            batch_size=3
+        )
+        self.assertEqual(errors, [])
+        self.assertEqual(batches, [(2, 0), (0, 1)])
+
+        existing.refresh_from_db()
+        self.assertEqual((existing.text, existing.answer, existing.ege_number), ('Новое условие', 3, 2))
+        self.assertEqual(Problem.objects.get(id=500).text, 'Задача с явным id')
+        self.assertEqual(Problem.objects.count(), 3)
+
+    def test_sequence_reset(self):
+        self.run_import('id,text,answer,ege_number\n1000,Задача,1,1\n')
+        self.assertGreater(Problem.objects.create(ege_number=1, text='Следующая', answer=1).id, 1000)
+
+    def test_problem_id_index_invalidated(self):
+        from .variants import count_problems_by_number
+
+        caches['shared'].clear()
+        self.assertEqual(count_problems_by_number()[6], 0)
+        self.run_import('text,answer,ege_number\nЗадача,1,6\nЕще задача,2,6\n')
+        self.assertEqual(count_problems_by_number()[6], 2)
+
+
+class VariantIndexTests(TestCase):
+    """Индекс задач по номерам в памяти процесса и его версия в общем кэше"""
+
+    @classmethod
+    def setUpTestData(cls):
+        Problem.objects.bulk_create([
+            Problem(ege_number=number, text=f'Задача {number}.{i}', answer=number)
+            for number in range(1, 13)
+            for i in range(3)
+        ])
+
+    def setUp(self):
+        caches['shared'].clear()
+
+    def test_deleted_problem_never_in_variant(self):
+        from .variants import pick_variant_problems
+
+        pick_variant_problems()
+        deleted = set(Problem.objects.filter(ege_number=1).values_list('id', flat=True)[:2])
+        Problem.objects.filter(id__in=deleted).delete()
+
+        for _ in range(20):
+            problems = pick_variant_problems()
+            self.assertEqual(len(problems), 12)
+            self.assertFalse({problem.id for problem in problems} & deleted)
+
+    def test_stale_index_never_returns_deleted_problem(self):
+        from .variants import pick_variant_problems
+
+        pick_variant_problems()
+        # Удаление без сигналов: версия индекса не меняется, как после
+        # удаления в обход ORM
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM home_problem WHERE id IN (SELECT id FROM home_problem WHERE ege_number = 1 LIMIT 2)'
+            )
+        remaining = set(Problem.objects.values_list('id', flat=True))
+
+        for _ in range(20):
+            problems = pick_variant_problems()
+            self.assertEqual(len(problems), 12)
+            self.assertLessEqual({problem.id for problem in problems}, remaining)
+
+    def test_version_change_from_another_process(self):
+        from .variants import PROBLEM_ID_INDEX_VERSION_KEY, count_problems_by_number
+
+        self.assertEqual(count_problems_by_number()[2], 3)
+        Problem.objects.filter(ege_number=1).update(ege_number=2)
+        self.assertEqual(count_problems_by_number()[2], 3)
+
+        # Другой воркер сменил версию в общем кэше
+        caches['shared'].set(PROBLEM_ID_INDEX_VERSION_KEY, 'other', None)
+        self.assertEqual(count_problems_by_number()[2], 6)
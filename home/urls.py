@@ -9,8 +9,11 @@ urlpatterns = [
     path('result/', views.show_result, name='show_result'),
     path('numbers/', views.all_numbers, name='all_numbers'),
     path('number/<int:ege_number>/', views.problems_by_number, name='problems_by_number'),
+    path('search/', views.search_problems, name='search_problems'),
     path('user-statistics/', views.user_statistics, name='user_statistics'),
     path('global-statistics/', views.global_statistics, name='global_statistics'),
     path('check-problem/', views.check_problem, name='check_problem'),
-    path('number/<int:ege_number>/', views.problems_by_number, name='problems_by_number')
+    path('charts/<slug:kind>.png', views.chart_image, name='chart_image'),
+    path('charts/<slug:kind>.json', views.chart_data, name='chart_data'),
+    path('exports/attempts.csv', views.export_attempts, name='export_attempts'),
 ]
\ No newline at end of file
@@ -0,0 +1,70 @@
+import random
+from array import array
+
+from uuid import uuid4
+
+from django.core.cache import caches
+
+from .models import Problem
+
+# Индекс держится в памяти процесса, а его версия — в общем для всех
+# процессов кэше: изменение задач в одном воркере сменит версию, и остальные
+# перестроят индекс при следующем обращении
+PROBLEM_ID_INDEX_VERSION_KEY = 'home:problem_id_index_version'
+
+_index = None
+_index_version = None
+
+
+def build_problem_id_index():
+    """Идентификаторы задач, сгруппированные по номеру ЕГЭ"""
+    index = {number: array('q') for number in range(1, 13)}
+    problem_ids = Problem.objects.order_by().values_list('id', 'ege_number')
+    for problem_id, ege_number in problem_ids.iterator():
+        index.setdefault(ege_number, array('q')).append(problem_id)
+    return index
+
+
+def get_problem_id_index_version():
+    shared = caches['shared']
+    version = shared.get(PROBLEM_ID_INDEX_VERSION_KEY)
+    if version is None:
+        shared.add(PROBLEM_ID_INDEX_VERSION_KEY, uuid4().hex, None)
+        version = shared.get(PROBLEM_ID_INDEX_VERSION_KEY)
+    return version
+
+
+def get_problem_id_index():
+    global _index, _index_version
+
+    version = get_problem_id_index_version()
+    index = _index
+    if index is None or version != _index_version:
+        index = build_problem_id_index()
+        _index, _index_version = index, version
+    return index
+
+
+def invalidate_problem_id_index():
+    """Сменить версию индекса для всех процессов"""
+    caches['shared'].set(PROBLEM_ID_INDEX_VERSION_KEY, uuid4().hex, None)
+
+
+def count_problems_by_number():
+    return {number: len(ids) for number, ids in get_problem_id_index().items()}
+
+
+def pick_variant_problems():
+    """Случайный вариант: по одной задаче каждого номера за один запрос"""
+    for _ in range(2):
+        index = get_problem_id_index()
+        picked_ids = [random.choice(ids) for number, ids in sorted(index.items()) if ids]
+
+        problems = list(Problem.objects.filter(id__in=picked_ids))
+        if len(problems) == len(picked_ids):
+            break
+        # Индекс устарел: часть задач уже удалена
+        invalidate_problem_id_index()
+
+    problems.sort(key=lambda x: x.ege_number)
+    return problems
@@ -1,104 +1,67 @@
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Problem, UserStatistics, UserProblemAttempt
+from .models import Problem, UserStatistics, UserProblemAttempt, GlobalTypeCounters
+from .statistics import (
+    get_global_statistics, record_attempts,
+    get_user_weekly_statistics, get_user_difficult_problems, get_user_compacted_attempts,
+    get_user_statistics_snapshot, get_user_period_statistics, store_user_statistics
+)
+from .variants import pick_variant_problems, count_problems_by_number
+from .forms import StatisticsFilterForm, ProblemFilterForm, AttemptExportForm
+from .exports import export_rows, iter_csv
+from . import charts
+from .instrumentation import timed
 import random
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse, Http404, StreamingHttpResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
 from django.views.decorators.csrf import csrf_exempt
 import json
 from django.utils import timezone
-from django.db.models import Count, Sum, Avg, F, FloatField, Q
-import matplotlib
-
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import io
-import base64
+from django.db.models import Count, Sum, Avg, F, FloatField, Q, Max
+import hashlib
 import numpy as np
 from datetime import timedelta
 
 
-def get_or_create_user_statistics(request):
-    session_key = request.session.session_key
-    if not session_key:
-        request.session.save()
-        session_key = request.session.session_key
-
-    stats, created = UserStatistics.objects.get_or_create(
-        session_key=session_key
-    )
-    return stats
-
-
-def get_global_statistics():
-    total_users = UserStatistics.objects.count()
-
-    attempts_stats = UserProblemAttempt.objects.aggregate(
-        total_attempts=Count('id'),
-        total_correct_attempts=Count('id', filter=Q(is_correct=True)),
-        total_score=Sum('score')
-    )
-
-    total_attempts = attempts_stats['total_attempts'] or 0
-    total_correct_attempts = attempts_stats['total_correct_attempts'] or 0
-    total_score = attempts_stats['total_score'] or 0
-
-    overall_accuracy = 0
-    if total_attempts > 0:
-        overall_accuracy = round((total_correct_attempts / total_attempts) * 100, 1)
+def get_user_statistics(request):
+    """Статистика сессии только для чтения.
 
-    average_score_per_attempt = 0
-    if total_attempts > 0:
-        average_score_per_attempt = round(total_score / total_attempts, 2)
+    Сессия и строка UserStatistics не создаются: у посетителя без попыток
+    счетчики нулевые, строка появится при первой проверке варианта.
+    """
+    return get_user_statistics_snapshot(request.session)
 
-    average_score_per_user = 0
-    if total_users > 0:
-        average_score_per_user = round(total_score / total_users, 1)
 
-    problems_by_type = {}
-    for i in range(1, 13):
-        type_stats = UserProblemAttempt.objects.filter(
-            problem__ege_number=i
-        ).aggregate(
-            total=Count('id'),
-            correct=Count('id', filter=Q(is_correct=True)),
-            total_score=Sum('score')
-        )
-
-        total = type_stats['total'] or 0
-        correct = type_stats['correct'] or 0
-        score = type_stats['total_score'] or 0
+def get_statistics_filter(request):
+    """Форма фильтра статистики, выбранный период и номер задачи (или None)"""
+    form = StatisticsFilterForm(request.GET if 'period' in request.GET else None)
+    if form.is_bound and form.is_valid():
+        problem_type = form.cleaned_data['problem_type']
+        return form, form.cleaned_data['period'], int(problem_type) if problem_type else None
+    return form, 'all', None
 
-        accuracy = 0
-        if total > 0:
-            accuracy = round((correct / total) * 100, 1)
 
-        avg_score = 0
-        if total > 0:
-            avg_score = round(score / total, 2)
+def grade_answer(problem, user_answer_str):
+    """Проверить ответ: (правильно ли, баллы, ответ числом)"""
+    if not user_answer_str:
+        return False, 0, 0
 
-        problems_by_type[str(i)] = {
-            'total': total,
-            'correct': correct,
-            'score': score,
-            'accuracy': accuracy,
-            'average_score': avg_score
-        }
+    try:
+        user_answer = float(user_answer_str)
+    except ValueError:
+        return False, 0, 0
 
-    return {
-        'total_users': total_users,
-        'total_attempts': total_attempts,
-        'total_correct_attempts': total_correct_attempts,
-        'total_score': total_score,
-        'overall_accuracy': overall_accuracy,
-        'average_score_per_attempt': average_score_per_attempt,
-        'average_score_per_user': average_score_per_user,
-        'problems_by_type': problems_by_type,
-        'updated_at': timezone.now()
-    }
+    if abs(user_answer - float(problem.answer)) < 0.01:
+        return True, 1, user_answer
+    return False, 0, user_answer
 
 
 def index(request):
     try:
-        global_stats = get_global_statistics()
+        global_stats = get_global_statistics(request)
     except Exception as e:
         global_stats = {
             'total_users': 0,
@@ -116,19 +79,14 @@ def index(request):
         is_correct=True
     ).select_related('problem').order_by('-created_at')[:10]
 
-    problems_with_attempts = []
-    problems = Problem.objects.all()
-
-    for problem in problems:
-        stats = problem.stats
-        if stats['total_attempts'] > 0:
-            problems_with_attempts.append({
-                'problem': problem,
-                'stats': stats,
-                'accuracy': stats['accuracy']
-            })
-
-    difficult_problems = sorted(problems_with_attempts, key=lambda x: x['accuracy'])[:5]
+    difficult_problems = [
+        {
+            'problem': problem,
+            'stats': problem.stats,
+            'accuracy': problem.stats['accuracy']
+        }
+        for problem in Problem.objects.hardest(5)
+    ]
 
     return render(request, 'home/index.html', {
         'global_stats': global_stats,
@@ -138,7 +96,7 @@ def index(request):
 
 
 def choose_mode(request):
-    user_stats = get_or_create_user_statistics(request)
+    user_stats = get_user_statistics(request)
     return render(request, 'home/choose.html', {
         'user_stats': user_stats,
     })
@@ -147,14 +105,7 @@ def choose_mode(request):
 def full_variant(request):
     variant_id = request.GET.get('variant_id', 1)
 
-    selected_problems = []
-    for number in range(1, 13):
-        problems_for_number = Problem.objects.filter(ege_number=number)
-        if problems_for_number.exists():
-            problem = random.choice(problems_for_number)
-            selected_problems.append(problem)
-
-    selected_problems.sort(key=lambda x: x.ege_number)
+    selected_problems = pick_variant_problems()
 
     request.session['current_variant_ids'] = [p.id for p in selected_problems]
     request.session['variant_id'] = variant_id
@@ -178,43 +129,12 @@ def check_variant(request):
 
     results = []
     total_score = 0
-
-    user_stats = get_or_create_user_statistics(request)
+    attempts = []
 
     for problem in selected_problems:
         user_answer_str = request.POST.get(f'answer_{problem.id}', '').strip()
-        if not user_answer_str:
-            results.append({
-                'problem_id': problem.id,
-                'problem_number': problem.ege_number,
-                'is_correct': False,
-                'correct_answer': problem.answer,
-                'user_answer': '',
-                'score': 0
-            })
-            UserProblemAttempt.objects.create(
-                session_key=request.session.session_key,
-                problem=problem,
-                is_correct=False,
-                user_answer=0,
-                score=0
-            )
-            user_stats.update_statistics(problem, False, 0)
-            continue
-
-        try:
-            user_answer = float(user_answer_str)
-            correct_answer = float(problem.answer)
-            if abs(user_answer - correct_answer) < 0.01:
-                is_correct = True
-                score = 1
-                total_score += score
-            else:
-                is_correct = False
-                score = 0
-        except ValueError:
-            is_correct = False
-            score = 0
+        is_correct, score, user_answer = grade_answer(problem, user_answer_str)
+        total_score += score
 
         results.append({
             'problem_id': problem.id,
@@ -224,16 +144,17 @@ def check_variant(request):
             'user_answer': user_answer_str,
             'score': score
         })
-
-        UserProblemAttempt.objects.create(
+        attempts.append(UserProblemAttempt(
             session_key=request.session.session_key,
             problem=problem,
+            ege_number=problem.ege_number,
             is_correct=is_correct,
-            user_answer=user_answer if 'user_answer' in locals() else 0,
+            user_answer=user_answer,
             score=score
-        )
+        ))
 
-        user_stats.update_statistics(problem, is_correct, score)
+    user_stats = record_attempts(request.session.session_key, attempts)
+    store_user_statistics(request.session, user_stats)
 
     request.session['check_results'] = results
     request.session['total_score'] = total_score
@@ -250,8 +171,8 @@ def show_result(request):
     if not results:
         return redirect('full_variant')
 
-    user_stats = get_or_create_user_statistics(request)
-    global_stats = get_global_statistics()
+    user_stats = get_user_statistics(request)
+    global_stats = get_global_statistics(request)
 
     type_stats = {}
     for result in results:
@@ -279,45 +200,13 @@ def show_result(request):
     })
 
 
-def problems_by_number(request, ege_number):
-    problems = Problem.objects.filter(ege_number=ege_number)
-
-    user_stats = get_or_create_user_statistics(request)
-    user_type_stats = user_stats.get_type_statistics(ege_number)
-
-    global_stats = get_global_statistics()
-    global_type_stats = global_stats['problems_by_type'].get(str(ege_number), {
-        'total': 0,
-        'correct': 0,
-        'score': 0,
-        'accuracy': 0,
-        'average_score': 0
-    })
-
-    problems_with_stats = []
-    for problem in problems:
-        stats = problem.stats
-        problems_with_stats.append({
-            'problem': problem,
-            'stats': stats
-        })
-
-    return render(request, 'home/problems_by_number.html', {
-        'problems': problems,
-        'problems_with_stats': problems_with_stats,
-        'ege_number': ege_number,
-        'total': problems.count(),
-        'user_type_stats': user_type_stats,
-        'global_type_stats': global_type_stats,
-    })
-
-
 def all_numbers(request):
     numbers = []
-    global_stats = get_global_statistics()
+    global_stats = get_global_statistics(request)
+    problem_counts = count_problems_by_number()
 
     for i in range(1, 13):
-        count = Problem.objects.filter(ege_number=i).count()
+        count = problem_counts.get(i, 0)
         type_stats = global_stats['problems_by_type'].get(str(i), {
             'total': 0,
             'correct': 0,
@@ -330,7 +219,7 @@ def all_numbers(request):
             'accuracy': type_stats['accuracy']
         })
 
-    user_stats = get_or_create_user_statistics(request)
+    user_stats = get_user_statistics(request)
 
     return render(request, 'home/all_numbers.html', {
         'numbers': numbers,
@@ -338,196 +227,235 @@ def all_numbers(request):
     })
 
 
-def generate_progress_chart(request):
-    try:
-        user_stats = get_or_create_user_statistics(request)
+def global_data_version(global_stats):
+    return (
+        f"{global_stats['period']}-{global_stats['total_attempts']}"
+        f"-{global_stats['total_correct_attempts']}"
+    )
 
-        user_attempts = UserProblemAttempt.objects.filter(
-            session_key=request.session.session_key
-        ).order_by('created_at')
 
-        if user_attempts.count() <= 1:
-            return None
+def user_data_version(user_stats):
+    period = getattr(user_stats, 'period', 'all')
+    return f"{user_stats.session_key}-{period}-{user_stats.total_attempts}"
 
-        attempt_numbers = []
-        cumulative_accuracy = []
-        correct_count = 0
 
-        for i, attempt in enumerate(user_attempts, 1):
-            if attempt.is_correct:
-                correct_count += 1
-            current_accuracy = (correct_count / i) * 100
-            attempt_numbers.append(i)
-            cumulative_accuracy.append(current_accuracy)
+def user_and_global_accuracies(user_stats, global_stats):
+    user_accuracies = []
+    global_accuracies = []
 
-        plt.figure(figsize=(12, 6))
+    for i in charts.PROBLEM_NUMBERS:
+        user_type = user_stats.get_type_statistics(i)
+        global_type = global_stats['problems_by_type'].get(str(i), {'accuracy': 0})
+        user_accuracies.append(user_type['accuracy'])
+        global_accuracies.append(global_type['accuracy'])
 
-        plt.plot(attempt_numbers, cumulative_accuracy,
-                 color='#4CAF50', linewidth=3, marker='o', markersize=5,
-                 label='Точность (%)')
+    return user_accuracies, global_accuracies
 
-        plt.fill_between(attempt_numbers, cumulative_accuracy, alpha=0.2, color='#4CAF50')
 
-        avg_accuracy = user_stats.accuracy
-        plt.axhline(y=avg_accuracy, color='#FF5722', linestyle='--',
-                    linewidth=2, alpha=0.7, label=f'Средняя: {avg_accuracy:.1f}%')
+def progress_chart_source(user_stats):
+    if user_stats.total_attempts <= 1:
+        return None
 
-        plt.xlabel('Номер попытки', fontsize=12, fontweight='bold')
-        plt.ylabel('Точность (%)', fontsize=12, fontweight='bold')
-        plt.title('Динамика точности решений', fontsize=16, fontweight='bold', pad=20)
-        plt.grid(True, alpha=0.3, linestyle='--')
-        plt.legend(loc='best')
-        plt.ylim(0, 100)
+    def prepare():
+        outcomes = UserProblemAttempt.objects.filter(
+            session_key=user_stats.session_key
+        ).order_by('created_at', 'id').values_list('is_correct', flat=True)
+        period_start = getattr(user_stats, 'period_start', None)
+        if period_start is not None:
+            outcomes = outcomes.filter(created_at__gte=period_start)
+
+        outcomes = np.fromiter(outcomes.iterator(chunk_size=5000), dtype=bool)
+        compacted = get_user_compacted_attempts(
+            user_stats, len(outcomes), int(outcomes.sum())
+        )
+        attempt_numbers, cumulative_accuracy = charts.downsample_lttb(
+            *charts.cumulative_accuracy_series(outcomes, compacted),
+            charts.PROGRESS_CHART_POINTS
+        )
 
-        if len(cumulative_accuracy) > 0:
-            last_acc = cumulative_accuracy[-1]
-            plt.annotate(f'{last_acc:.1f}%',
-                         xy=(attempt_numbers[-1], last_acc),
-                         xytext=(10, 10), textcoords='offset points',
-                         bbox=dict(boxstyle='round,pad=0.3', facecolor='yellow', alpha=0.7),
-                         arrowprops=dict(arrowstyle='->', connectionstyle='arc3,rad=0'))
+        return charts.render_progress_chart, (
+            attempt_numbers.tolist(), cumulative_accuracy.tolist(), user_stats.accuracy
+        )
 
-        plt.tight_layout()
+    return user_data_version(user_stats), prepare
 
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
-        buffer.seek(0)
-        image_png = buffer.getvalue()
-        buffer.close()
-        plt.close()
 
-        return base64.b64encode(image_png).decode('utf-8')
+def global_accuracy_chart_source(global_stats):
+    accuracies = []
+    for i in charts.PROBLEM_NUMBERS:
+        stats = global_stats['problems_by_type'].get(str(i), {'accuracy': 0})
+        accuracies.append(stats['accuracy'])
 
-    except Exception as e:
-        print(f"Ошибка при генерации графика прогресса: {e}")
-        return None
+    return global_data_version(global_stats), lambda: (
+        charts.render_global_accuracy_chart, (accuracies, global_stats['overall_accuracy'])
+    )
 
 
-def generate_global_accuracy_chart():
-    try:
-        global_stats = get_global_statistics()
+def global_comparison_chart_source(global_stats):
+    total_attempts = []
+    correct_attempts = []
 
-        problem_numbers = list(range(1, 13))
-        accuracies = []
+    for i in charts.PROBLEM_NUMBERS:
+        stats = global_stats['problems_by_type'].get(str(i), {'total': 0, 'correct': 0})
+        total_attempts.append(stats['total'])
+        correct_attempts.append(stats['correct'])
 
-        for i in problem_numbers:
-            stats = global_stats['problems_by_type'].get(str(i), {'accuracy': 0})
-            accuracies.append(stats['accuracy'])
+    return global_data_version(global_stats), lambda: (
+        charts.render_global_comparison_chart, (total_attempts, correct_attempts)
+    )
 
-        plt.figure(figsize=(14, 7))
 
-        colors = []
-        for acc in accuracies:
-            if acc >= 70:
-                colors.append('#4CAF50')
-            elif acc >= 40:
-                colors.append('#FF9800')
-            else:
-                colors.append('#F44336')
+def user_vs_global_chart_source(user_stats, global_stats):
+    user_accuracies, global_accuracies = user_and_global_accuracies(user_stats, global_stats)
 
-        bars = plt.bar(problem_numbers, accuracies, color=colors, edgecolor='black', linewidth=1.5)
+    version = f'{user_data_version(user_stats)}:{global_data_version(global_stats)}'
+    return version, lambda: (
+        charts.render_user_vs_global_chart, (user_accuracies, global_accuracies)
+    )
 
-        plt.xlabel('Номер задачи', fontsize=13, fontweight='bold')
-        plt.ylabel('Точность (%)', fontsize=13, fontweight='bold')
-        plt.title('Общая точность по типам задач', fontsize=16, fontweight='bold', pad=20)
-        plt.xticks(problem_numbers)
-        plt.ylim(0, 100)
-        plt.grid(axis='y', alpha=0.3, linestyle='--')
 
-        for bar, acc in zip(bars, accuracies):
-            height = bar.get_height()
-            plt.text(bar.get_x() + bar.get_width() / 2., height + 1,
-                     f'{acc:.1f}%', ha='center', va='bottom', fontsize=10, fontweight='bold')
+def user_accuracy_chart_source(user_stats):
+    user_accuracies = []
+    for i in charts.PROBLEM_NUMBERS:
+        type_stats = user_stats.get_type_statistics(i)
+        user_accuracies.append(type_stats['accuracy'])
 
-        avg_global_accuracy = global_stats['overall_accuracy']
-        plt.axhline(y=avg_global_accuracy, color='#2196F3', linestyle='--',
-                    linewidth=2, alpha=0.7, label=f'Средняя: {avg_global_accuracy:.1f}%')
+    return user_data_version(user_stats), lambda: (
+        charts.render_user_accuracy_chart, (user_accuracies, user_stats.accuracy)
+    )
 
-        plt.legend(loc='upper right')
 
-        ax = plt.gca()
-        ax.set_facecolor('#f8f9fa')
+def user_comparison_chart_source(user_stats, global_stats):
+    user_accuracies, global_accuracies = user_and_global_accuracies(user_stats, global_stats)
 
-        plt.tight_layout()
+    version = f'{user_data_version(user_stats)}:{global_data_version(global_stats)}'
+    return version, lambda: (
+        charts.render_user_comparison_chart, (user_accuracies, global_accuracies)
+    )
 
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
-        buffer.seek(0)
-        image_png = buffer.getvalue()
-        buffer.close()
-        plt.close()
 
-        return base64.b64encode(image_png).decode('utf-8')
+GLOBAL_CHARTS = {
+    'global-accuracy': global_accuracy_chart_source,
+    'global-comparison': global_comparison_chart_source,
+}
 
-    except Exception as e:
-        print(f"Ошибка при генерации глобального графика точности: {e}")
-        return None
+USER_CHARTS = {
+    'progress': lambda user_stats, global_stats: progress_chart_source(user_stats),
+    'user-accuracy': lambda user_stats, global_stats: user_accuracy_chart_source(user_stats),
+    'user-vs-global': user_vs_global_chart_source,
+    'user-comparison': user_comparison_chart_source,
+}
 
 
-def generate_global_comparison_chart():
-    try:
-        global_stats = get_global_statistics()
+def chart_etag(kind, version):
+    return hashlib.md5(f'{kind}:{version}'.encode()).hexdigest()[:16]
 
-        problem_numbers = list(range(1, 13))
-        total_attempts = []
-        correct_attempts = []
 
-        for i in problem_numbers:
-            stats = global_stats['problems_by_type'].get(str(i), {'total': 0, 'correct': 0})
-            total_attempts.append(stats['total'])
-            correct_attempts.append(stats['correct'])
+def get_chart_mode(request):
+    """Где рисовать графики: на сервере (PNG) или в браузере (JSON)"""
+    mode = request.GET.get('charts', settings.CHART_RENDER_MODE)
+    return mode if mode in ('server', 'client') else 'server'
 
-        fig, ax1 = plt.subplots(figsize=(14, 7))
 
-        bars = ax1.bar(problem_numbers, total_attempts, color='#2196F3', alpha=0.7, label='Всего попыток')
+def chart_links(kind, source, period='all'):
+    """Адреса картинки и данных графика; версия в адресе позволяет кэшировать их в браузере"""
+    if source is None:
+        return None
+    version, prepare = source
+    query = f"?v={chart_etag(kind, version)}"
+    if period != 'all':
+        query += f"&period={period}"
+    return {
+        'kind': kind,
+        'image': f"{reverse('chart_image', args=[kind])}{query}",
+        'data': f"{reverse('chart_data', args=[kind])}{query}",
+    }
 
-        ax2 = ax1.twinx()
-        ax2.plot(problem_numbers, correct_attempts, color='#4CAF50',
-                 marker='s', linewidth=3, markersize=8, label='Правильные решения')
 
-        ax1.set_xlabel('Номер задачи', fontsize=13, fontweight='bold')
-        ax1.set_ylabel('Количество попыток', fontsize=13, fontweight='bold', color='#2196F3')
-        ax2.set_ylabel('Правильные решения', fontsize=13, fontweight='bold', color='#4CAF50')
+def resolve_chart(request, kind):
+    """Источник графика, личный ли он и время последнего изменения данных"""
+    form, period, problem_type = get_statistics_filter(request)
+    if kind in GLOBAL_CHARTS:
+        source = GLOBAL_CHARTS[kind](get_global_statistics(request, period))
+        is_private = False
+        last_modified = GlobalTypeCounters.objects.aggregate(
+            updated_at=Max('updated_at')
+        )['updated_at']
+    elif kind in USER_CHARTS:
+        user_stats = get_user_period_statistics(get_user_statistics(request), period)
+        source = USER_CHARTS[kind](user_stats, get_global_statistics(request, period))
+        is_private = True
+        last_modified = user_stats.last_activity
+    else:
+        raise Http404("Неизвестный график")
 
-        ax1.tick_params(axis='y', labelcolor='#2196F3')
-        ax2.tick_params(axis='y', labelcolor='#4CAF50')
+    if source is None:
+        raise Http404("Недостаточно данных для графика")
 
-        plt.title('Сравнение: попытки vs правильные решения', fontsize=16, fontweight='bold', pad=20)
-        plt.xticks(problem_numbers)
+    return source, is_private, last_modified
 
-        for bar, total in zip(bars, total_attempts):
-            height = bar.get_height()
-            ax1.text(bar.get_x() + bar.get_width() / 2., height + max(total_attempts) * 0.01,
-                     f'{total}', ha='center', va='bottom', fontsize=9)
 
-        for i, correct in enumerate(correct_attempts):
-            ax2.text(problem_numbers[i], correct + max(correct_attempts) * 0.02,
-                     f'{correct}', ha='center', va='bottom', fontsize=9, fontweight='bold', color='#2E7D32')
+def chart_response(request, kind, make_response):
+    """Ответ с графиком с поддержкой ETag/Last-Modified и 304 Not Modified"""
+    source, is_private, last_modified = resolve_chart(request, kind)
 
-        lines_1, labels_1 = ax1.get_legend_handles_labels()
-        lines_2, labels_2 = ax2.get_legend_handles_labels()
-        ax1.legend(lines_1 + lines_2, labels_1 + labels_2, loc='upper left')
+    version, prepare = source
+    etag = chart_etag(kind, version)
+    last_modified = int(last_modified.timestamp()) if last_modified else None
 
-        plt.grid(axis='x', alpha=0.3)
-        plt.tight_layout()
+    response = get_conditional_response(
+        request, etag=quote_etag(etag), last_modified=last_modified
+    )
+    if response is None:
+        response = make_response(version, prepare)
+        if response.status_code != 200 or getattr(response, 'chart_pending', False):
+            return response
+
+    response['ETag'] = quote_etag(etag)
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+
+    if request.GET.get('v') == etag:
+        # Адрес с актуальной версией данных больше не изменится
+        patch_cache_control(response, max_age=60 * 60 * 24 * 365, immutable=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    if is_private:
+        patch_cache_control(response, private=True)
+        patch_vary_headers(response, ['Cookie'])
+    else:
+        patch_cache_control(response, public=True)
 
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
-        buffer.seek(0)
-        image_png = buffer.getvalue()
-        buffer.close()
-        plt.close()
+    return response
 
-        return base64.b64encode(image_png).decode('utf-8')
 
-    except Exception as e:
-        print(f"Ошибка при генерации графика сравнения: {e}")
-        return None
+def chart_image(request, kind):
+    def make_response(version, prepare):
+        image_png = charts.get_chart_png(kind, version, prepare)
+        if image_png is None:
+            # График еще рисуется в пуле и появится в кэше. Браузер не повторяет
+            # запрос картинки после 503, поэтому отдается заглушка, которую
+            # нельзя кэшировать: при следующей загрузке страницы придет график
+            response = HttpResponse(charts.pending_chart_png(), content_type='image/png')
+            response.chart_pending = True
+            patch_cache_control(response, no_store=True)
+            return response
+        return HttpResponse(image_png, content_type='image/png')
+
+    return chart_response(request, kind, make_response)
+
+
+def chart_data(request, kind):
+    def make_response(version, prepare):
+        with timed('chart'):
+            return JsonResponse(charts.chart_series(kind, *prepare()))
+
+    return chart_response(request, kind, make_response)
 
 
-def get_data_source_info():
-    total_problems = Problem.objects.count()
-    total_attempts = UserProblemAttempt.objects.count()
+def get_data_source_info(global_stats):
+    total_problems = sum(count_problems_by_number().values())
+    total_attempts = global_stats['total_attempts']
     updated_at = timezone.now().strftime("%d.%m.%Y %H:%M")
 
     return {
@@ -538,33 +466,48 @@ def get_data_source_info():
 
 
 def global_statistics(request):
-    global_stats = get_global_statistics()
+    filter_form, period, problem_type = get_statistics_filter(request)
+    global_stats = get_global_statistics(request, period)
 
-    graph_image = generate_global_accuracy_chart()
+    graph_image = chart_links(
+        'global-accuracy', global_accuracy_chart_source(global_stats), period
+    )
 
-    comparison_image = generate_global_comparison_chart()
+    comparison_image = chart_links(
+        'global-comparison', global_comparison_chart_source(global_stats), period
+    )
 
-    user_session = request.session.session_key
-    if user_session:
-        user_vs_global_image = generate_user_vs_global_chart(user_session, global_stats)
+    user_stats = get_user_statistics(request)
+    if user_stats.pk:
+        user_stats = get_user_period_statistics(user_stats, period)
+        user_vs_global_image = chart_links(
+            'user-vs-global', user_vs_global_chart_source(user_stats, global_stats), period
+        )
     else:
         user_vs_global_image = None
 
-    data_source = get_data_source_info()
+    data_source = get_data_source_info(global_stats)
 
-    problem_stats = []
     problems = Problem.objects.all()
-    for problem in problems:
-        stats = problem.stats
-        if stats['total_attempts'] >= 1:
-            problem_stats.append({
-                'problem': problem,
-                'stats': stats,
-                'accuracy': stats['accuracy']
-            })
-
-    difficult_problems = sorted(problem_stats, key=lambda x: x['accuracy'])[:10]
-    easy_problems = sorted(problem_stats, key=lambda x: x['accuracy'], reverse=True)[:10]
+    if problem_type:
+        problems = problems.filter(ege_number=problem_type)
+
+    difficult_problems = [
+        {
+            'problem': problem,
+            'stats': problem.stats,
+            'accuracy': problem.stats['accuracy']
+        }
+        for problem in problems.hardest(10)
+    ]
+    easy_problems = [
+        {
+            'problem': problem,
+            'stats': problem.stats,
+            'accuracy': problem.stats['accuracy']
+        }
+        for problem in problems.easiest(10)
+    ]
 
     active_users = UserStatistics.objects.filter(
         total_attempts__gt=0
@@ -576,6 +519,8 @@ def global_statistics(request):
 
     type_stats = []
     for i in range(1, 13):
+        if problem_type and i != problem_type:
+            continue
         stats = global_stats['problems_by_type'].get(str(i), {
             'total': 0,
             'correct': 0,
@@ -598,226 +543,26 @@ def global_statistics(request):
         'graph_image': graph_image,
         'comparison_image': comparison_image,
         'user_vs_global_image': user_vs_global_image,
+        'chart_mode': get_chart_mode(request),
         'data_source': data_source,
+        'filter_form': filter_form,
     })
 
 
-def generate_user_vs_global_chart(session_key, global_stats):
-    try:
-        user_stats = UserStatistics.objects.get(session_key=session_key)
-
-        problem_numbers = list(range(1, 13))
-        user_accuracies = []
-        global_accuracies = []
-
-        for i in problem_numbers:
-            user_type = user_stats.get_type_statistics(i)
-            global_type = global_stats['problems_by_type'].get(str(i), {'accuracy': 0})
-            user_accuracies.append(user_type['accuracy'])
-            global_accuracies.append(global_type['accuracy'])
-
-        fig, ax = plt.subplots(figsize=(14, 7))
-
-        x = np.arange(len(problem_numbers))
-        width = 0.35
-
-        bars1 = ax.bar(x - width / 2, user_accuracies, width,
-                       label='Ваша точность', color='#4CAF50', edgecolor='black')
-        bars2 = ax.bar(x + width / 2, global_accuracies, width,
-                       label='Общая точность', color='#2196F3', edgecolor='black', alpha=0.7)
-
-        ax.set_xlabel('Номер задачи', fontsize=13, fontweight='bold')
-        ax.set_ylabel('Точность (%)', fontsize=13, fontweight='bold')
-        ax.set_title('Сравнение вашей точности с общей точностью', fontsize=16, fontweight='bold', pad=20)
-        ax.set_xticks(x)
-        ax.set_xticklabels(problem_numbers)
-        ax.set_ylim(0, 100)
-        ax.grid(axis='y', alpha=0.3, linestyle='--')
-
-        ax.legend(loc='upper right')
-
-        def autolabel(bars):
-            for bar in bars:
-                height = bar.get_height()
-                if height > 0:
-                    ax.annotate(f'{height:.1f}%',
-                                xy=(bar.get_x() + bar.get_width() / 2, height),
-                                xytext=(0, 3),
-                                textcoords="offset points",
-                                ha='center', va='bottom', fontsize=9,
-                                fontweight='bold' if height >= 50 else 'normal')
-
-        autolabel(bars1)
-        autolabel(bars2)
-
-        for i in range(len(problem_numbers)):
-            user_acc = user_accuracies[i]
-            global_acc = global_accuracies[i]
-            diff = user_acc - global_acc
-
-            if abs(diff) > 5:
-                diff_color = '#2E7D32' if diff > 0 else '#C62828'
-                diff_text = f"+{diff:.1f}%" if diff > 0 else f"{diff:.1f}%"
-
-                y_pos = max(user_acc, global_acc) + 5
-                ax.annotate(diff_text,
-                            xy=(i, y_pos),
-                            xytext=(0, 0),
-                            textcoords="offset points",
-                            ha='center', va='bottom',
-                            fontsize=10, fontweight='bold',
-                            color=diff_color)
-
-        plt.tight_layout()
-
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
-        buffer.seek(0)
-        image_png = buffer.getvalue()
-        buffer.close()
-        plt.close()
-
-        return base64.b64encode(image_png).decode('utf-8')
-
-    except UserStatistics.DoesNotExist:
-        return None
-    except Exception as e:
-        print(f"Ошибка при генерации графика сравнения пользователя с общей статистикой: {e}")
-        return None
-
-
-def generate_user_accuracy_chart(session_key):
-    try:
-        user_stats = UserStatistics.objects.get(session_key=session_key)
-
-        problem_numbers = list(range(1, 13))
-        user_accuracies = []
-
-        for i in problem_numbers:
-            type_stats = user_stats.get_type_statistics(i)
-            user_accuracies.append(type_stats['accuracy'])
-
-        plt.figure(figsize=(14, 7))
-
-        colors = []
-        for acc in user_accuracies:
-            if acc >= 70:
-                colors.append('#4CAF50')
-            elif acc >= 40:
-                colors.append('#FF9800')
-            else:
-                colors.append('#F44336')
-
-        bars = plt.bar(problem_numbers, user_accuracies, color=colors, edgecolor='black', linewidth=1.5)
-
-        plt.xlabel('Номер задачи', fontsize=13, fontweight='bold')
-        plt.ylabel('Точность (%)', fontsize=13, fontweight='bold')
-        plt.title('Моя точность по типам задач', fontsize=16, fontweight='bold', pad=20)
-        plt.xticks(problem_numbers)
-        plt.ylim(0, 100)
-        plt.grid(axis='y', alpha=0.3, linestyle='--')
-
-        for bar, acc in zip(bars, user_accuracies):
-            height = bar.get_height()
-            plt.text(bar.get_x() + bar.get_width() / 2., height + 1,
-                     f'{acc:.1f}%', ha='center', va='bottom', fontsize=10, fontweight='bold')
-
-        plt.axhline(y=user_stats.accuracy, color='#2196F3', linestyle='--',
-                    linewidth=2, alpha=0.7, label=f'Средняя: {user_stats.accuracy:.1f}%')
-
-        plt.legend(loc='upper right')
-
-        ax = plt.gca()
-        ax.set_facecolor('#f8f9fa')
-
-        plt.tight_layout()
-
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
-        buffer.seek(0)
-        image_png = buffer.getvalue()
-        buffer.close()
-        plt.close()
-
-        return base64.b64encode(image_png).decode('utf-8')
-
-    except Exception as e:
-        print(f"Ошибка при генерации графика точности пользователя: {e}")
-        return None
-
-
-def generate_user_comparison_chart(session_key):
-    try:
-        user_stats = UserStatistics.objects.get(session_key=session_key)
-        global_stats = get_global_statistics()
-
-        problem_numbers = list(range(1, 13))
-        user_accuracies = []
-        global_accuracies = []
-
-        for i in problem_numbers:
-            user_type = user_stats.get_type_statistics(i)
-            global_type = global_stats['problems_by_type'].get(str(i), {'accuracy': 0})
-            user_accuracies.append(user_type['accuracy'])
-            global_accuracies.append(global_type['accuracy'])
-
-        x = np.arange(len(problem_numbers))
-        width = 0.35
-
-        fig, ax = plt.subplots(figsize=(14, 7))
-
-        bars1 = ax.bar(x - width / 2, user_accuracies, width,
-                       label='Моя точность', color='#4CAF50', edgecolor='black')
-        bars2 = ax.bar(x + width / 2, global_accuracies, width,
-                       label='Общая точность', color='#2196F3', edgecolor='black', alpha=0.7)
-
-        ax.set_xlabel('Номер задачи', fontsize=13, fontweight='bold')
-        ax.set_ylabel('Точность (%)', fontsize=13, fontweight='bold')
-        ax.set_title('Сравнение: моя точность vs общая точность', fontsize=16, fontweight='bold', pad=20)
-        ax.set_xticks(x)
-        ax.set_xticklabels(problem_numbers)
-        ax.set_ylim(0, 100)
-        ax.grid(axis='y', alpha=0.3, linestyle='--')
-
-        ax.legend()
-
-        def autolabel(bars):
-            for bar in bars:
-                height = bar.get_height()
-                ax.annotate(f'{height:.1f}%',
-                            xy=(bar.get_x() + bar.get_width() / 2, height),
-                            xytext=(0, 3),
-                            textcoords="offset points",
-                            ha='center', va='bottom', fontsize=9)
-
-        autolabel(bars1)
-        autolabel(bars2)
-
-        plt.tight_layout()
-
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
-        buffer.seek(0)
-        image_png = buffer.getvalue()
-        buffer.close()
-        plt.close()
-
-        return base64.b64encode(image_png).decode('utf-8')
-
-    except Exception as e:
-        print(f"Ошибка при генерации графика сравнения: {e}")
-        return None
-
-
 def user_statistics(request):
-    user_stats = get_or_create_user_statistics(request)
-    global_stats = get_global_statistics()
+    filter_form, period, problem_type = get_statistics_filter(request)
+    user_stats = get_user_period_statistics(get_user_statistics(request), period)
+    global_stats = get_global_statistics(request, period)
 
-    progress_image = generate_progress_chart(request)
-    accuracy_image = generate_user_accuracy_chart(request.session.session_key)
-    comparison_image = generate_user_comparison_chart(request.session.session_key)
+    progress_image = chart_links('progress', progress_chart_source(user_stats), period)
+    accuracy_image = chart_links(
+        'user-accuracy', user_accuracy_chart_source(user_stats), period
+    )
+    comparison_image = chart_links(
+        'user-comparison', user_comparison_chart_source(user_stats, global_stats), period
+    )
 
-    data_source = get_data_source_info()
+    data_source = get_data_source_info(global_stats)
 
     recent_attempts = UserProblemAttempt.objects.filter(
         session_key=request.session.session_key
@@ -825,6 +570,8 @@ def user_statistics(request):
 
     type_stats = []
     for i in range(1, 13):
+        if problem_type and i != problem_type:
+            continue
         user_type = user_stats.get_type_statistics(i)
         global_type = global_stats['problems_by_type'].get(str(i), {
             'total': 0,
@@ -840,55 +587,8 @@ def user_statistics(request):
             'global': global_type
         })
 
-    user_attempts_by_problem = UserProblemAttempt.objects.filter(
-        session_key=request.session.session_key
-    ).values('problem').annotate(
-        total=Count('id'),
-        correct=Count('id', filter=Q(is_correct=True))
-    )
-
-    difficult_problems_data = []
-    for attempt in user_attempts_by_problem:
-        if attempt['total'] > 0:
-            try:
-                problem = Problem.objects.get(id=attempt['problem'])
-                accuracy = 0
-                if attempt['total'] > 0:
-                    accuracy = (attempt['correct'] / attempt['total']) * 100
-                difficult_problems_data.append({
-                    'problem': problem,
-                    'total': attempt['total'],
-                    'correct': attempt['correct'],
-                    'accuracy': round(accuracy, 1)
-                })
-            except Problem.DoesNotExist:
-                continue
-
-    difficult_problems = sorted(difficult_problems_data, key=lambda x: x['accuracy'])[:5]
-
-    week_ago = timezone.now() - timedelta(days=7)
-    weekly_attempts = UserProblemAttempt.objects.filter(
-        session_key=request.session.session_key,
-        created_at__gte=week_ago
-    )
-
-    weekly_correct = weekly_attempts.filter(is_correct=True).count()
-    weekly_total = weekly_attempts.count()
-    weekly_accuracy = round((weekly_correct / weekly_total * 100), 1) if weekly_total > 0 else 0
-
-    two_weeks_ago = timezone.now() - timedelta(days=14)
-    prev_weekly_attempts = UserProblemAttempt.objects.filter(
-        session_key=request.session.session_key,
-        created_at__range=[two_weeks_ago, week_ago]
-    )
-
-    prev_weekly_correct = prev_weekly_attempts.filter(is_correct=True).count()
-    prev_weekly_total = prev_weekly_attempts.count()
-    prev_weekly_accuracy = round((prev_weekly_correct / prev_weekly_total * 100), 1) if prev_weekly_total > 0 else 0
-
-    change = 0
-    if prev_weekly_accuracy > 0:
-        change = round(weekly_accuracy - prev_weekly_accuracy, 1)
+    difficult_problems = get_user_difficult_problems(request.session.session_key, 5)
+    weekly_stats = get_user_weekly_statistics(request.session.session_key)
 
     return render(request, 'home/user_statistics.html', {
         'user_stats': user_stats,
@@ -899,13 +599,10 @@ def user_statistics(request):
         'progress_image': progress_image,
         'accuracy_image': accuracy_image,
         'comparison_image': comparison_image,
+        'chart_mode': get_chart_mode(request),
         'data_source': data_source,
-        'weekly_stats': {
-            'total': weekly_total,
-            'correct': weekly_correct,
-            'accuracy': weekly_accuracy,
-            'change': change
-        }
+        'weekly_stats': weekly_stats,
+        'filter_form': filter_form,
     })
 
 
@@ -936,6 +633,55 @@ def check_problem(request):
     return redirect('all_numbers')
 
 
+SEARCH_RESULTS_LIMIT = 50
+
+
+def search_problems(request):
+    """Поиск задач по условию с фильтром по номеру"""
+    form = ProblemFilterForm(request.GET)
+    problems = []
+    searched = False
+
+    if form.is_valid():
+        query = form.cleaned_data['search'].strip()
+        problem_type = form.cleaned_data['problem_type']
+        if query or problem_type:
+            searched = True
+            queryset = Problem.objects.all()
+            if problem_type:
+                queryset = queryset.filter(ege_number=int(problem_type))
+            if query:
+                queryset = queryset.search(query)
+            problems = list(queryset[:SEARCH_RESULTS_LIMIT])
+
+    return render(request, 'home/search_problems.html', {
+        'form': form,
+        'problems': problems,
+        'searched': searched,
+        'limit': SEARCH_RESULTS_LIMIT,
+    })
+
+
+@staff_member_required
+def export_attempts(request):
+    """Журнал попыток в CSV потоком: ?date_from=ГГГГ-ММ-ДД&date_to=ГГГГ-ММ-ДД"""
+    form = AttemptExportForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+
+    date_from = form.cleaned_data['date_from']
+    date_to = form.cleaned_data['date_to']
+    rows = export_rows(date_from, date_to)
+
+    filename = 'attempts_{}_{}.csv'.format(
+        date_from.isoformat() if date_from else 'start',
+        date_to.isoformat() if date_to else timezone.localdate().isoformat()
+    )
+    response = StreamingHttpResponse(iter_csv(rows), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 def problems_by_number(request, ege_number, result=None):
     problems = Problem.objects.filter(ege_number=ege_number)
 
@@ -0,0 +1,142 @@
+// Отрисовка графиков статистики в браузере по JSON-данным с сервера.
+// Если Chart.js не загрузился или данные недоступны, показываем PNG с сервера.
+(function () {
+    var GREEN = '#4CAF50';
+    var BLUE = '#2196F3';
+    var ORANGE = '#FF9800';
+    var RED = '#F44336';
+
+    function accuracyColors(values) {
+        return values.map(function (value) {
+            if (value >= 70) {
+                return GREEN;
+            }
+            return value >= 40 ? ORANGE : RED;
+        });
+    }
+
+    function averageLine(labels, value, label, color) {
+        return {
+            type: 'line',
+            label: label + ': ' + value + '%',
+            data: labels.map(function () { return value; }),
+            borderColor: color,
+            borderDash: [6, 6],
+            pointRadius: 0
+        };
+    }
+
+    function percentScale() {
+        return {y: {min: 0, max: 100, title: {display: true, text: 'Точность (%)'}}};
+    }
+
+    var builders = {
+        'global-accuracy': function (data) {
+            var s = data.series;
+            return {
+                type: 'bar',
+                data: {
+                    labels: data.labels,
+                    datasets: [
+                        {label: 'Точность (%)', data: s.accuracies, backgroundColor: accuracyColors(s.accuracies)},
+                        averageLine(data.labels, s.overall_accuracy, 'Средняя', BLUE)
+                    ]
+                },
+                options: {scales: percentScale()}
+            };
+        },
+        'user-accuracy': function (data) {
+            var s = data.series;
+            return {
+                type: 'bar',
+                data: {
+                    labels: data.labels,
+                    datasets: [
+                        {label: 'Моя точность (%)', data: s.accuracies, backgroundColor: accuracyColors(s.accuracies)},
+                        averageLine(data.labels, s.average_accuracy, 'Средняя', BLUE)
+                    ]
+                },
+                options: {scales: percentScale()}
+            };
+        },
+        'global-comparison': function (data) {
+            var s = data.series;
+            return {
+                type: 'bar',
+                data: {
+                    labels: data.labels,
+                    datasets: [
+                        {label: 'Всего попыток', data: s.total_attempts, backgroundColor: BLUE},
+                        {type: 'line', label: 'Правильные решения', data: s.correct_attempts, borderColor: GREEN}
+                    ]
+                }
+            };
+        },
+        'user-comparison': function (data) {
+            var s = data.series;
+            return {
+                type: 'bar',
+                data: {
+                    labels: data.labels,
+                    datasets: [
+                        {label: 'Моя точность', data: s.user_accuracies, backgroundColor: GREEN},
+                        {label: 'Общая точность', data: s.global_accuracies, backgroundColor: BLUE}
+                    ]
+                },
+                options: {scales: percentScale()}
+            };
+        },
+        'progress': function (data) {
+            var s = data.series;
+            var points = s.cumulative_accuracy.map(function (value, i) {
+                return {x: s.attempt_numbers ? s.attempt_numbers[i] : i + 1, y: value};
+            });
+            return {
+                type: 'line',
+                data: {
+                    datasets: [
+                        {label: 'Точность (%)', data: points, borderColor: GREEN, fill: true, pointRadius: 0}
+                    ]
+                },
+                options: {
+                    parsing: false,
+                    scales: {
+                        x: {type: 'linear', title: {display: true, text: 'Номер попытки'}},
+                        y: percentScale().y
+                    }
+                }
+            };
+        }
+    };
+    builders['user-vs-global'] = builders['user-comparison'];
+
+    function fallback(canvas) {
+        var img = document.createElement('img');
+        img.src = canvas.dataset.fallbackSrc;
+        img.alt = canvas.getAttribute('aria-label');
+        img.className = 'img-fluid rounded';
+        canvas.replaceWith(img);
+    }
+
+    document.querySelectorAll('canvas.js-chart').forEach(function (canvas) {
+        var build = builders[canvas.dataset.chartKind];
+        if (typeof Chart === 'undefined' || !build) {
+            fallback(canvas);
+            return;
+        }
+
+        fetch(canvas.dataset.chartSrc, {credentials: 'same-origin'})
+            .then(function (response) {
+                if (!response.ok) {
+                    throw new Error(response.status);
+                }
+                return response.json();
+            })
+            .then(function (data) {
+                new Chart(canvas, build(data));
+            })
+            .catch(function () {
+                fallback(canvas);
+            });
+    });
+})();